@@ -0,0 +1,86 @@
+"""
+Columnar scan results shared between scan.py and view.py.
+
+For every watchlist it writes, scan.py also saves the candles of each listed
+ticker with their indicator values as one structured array (see ARTIFACT) in
+a .npy file next to the watchlist, plus a .json index giving each ticker's
+rows. view.py memory-maps the array and plots straight from it, without
+fetching or recomputing anything.
+
+    watchlists/watchlist_1h_20240101_1200.txt
+    watchlists/watchlist_1h_20240101_1200.npy
+    watchlists/watchlist_1h_20240101_1200.json
+"""
+import json
+import os
+import numpy as np
+from binance import INTERVAL_MS
+from klines import RECORD, records_to_frame
+from ranges import OHLCRanges
+from indicators import CANDLE_TAGS, CYCLE_STATES, candleTagCodes, relativeCandlesPhases, cycleCodes, squeeze
+
+ARTIFACT_CANDLES = 100  # Candles kept per ticker (what view.py plots)
+
+ARTIFACT = np.dtype(RECORD.descr + [
+    ('tag', 'i1'),  # TAG_* code
+    ('phase', 'i1'),
+    ('cycle', 'i1'),  # CYCLE_* code
+    ('squeeze', '<f8'),
+])
+
+def artifact_paths(watchlist_file):
+    """ Array and index paths of the artifact belonging to a watchlist file. """
+    base = os.path.splitext(watchlist_file)[0]
+    return f"{base}.npy", f"{base}.json"
+
+def artifact_rows(data, interval, candles=ARTIFACT_CANDLES):
+    """ ARTIFACT rows of the last `candles` candles, indicators computed on the whole of `data`. """
+    phases = relativeCandlesPhases(data)
+    ranges = OHLCRanges(data)
+    rows = np.zeros(data.shape[0], dtype=ARTIFACT)
+    rows['time'] = data.index.as_unit('ms').asi8
+    rows['close_time'] = rows['time'] + INTERVAL_MS.get(interval, 0) - 1
+    for field, column in (('open', 'Open'), ('high', 'High'), ('low', 'Low'), ('close', 'Close'),
+                          ('volume', 'Volume')):
+        rows[field] = data[column].to_numpy(dtype=float)
+    rows['tag'] = candleTagCodes(data)
+    rows['phase'] = phases
+    rows['cycle'] = cycleCodes(data, phases, ranges)
+    rows['squeeze'] = squeeze(data, ranges=ranges).to_numpy(dtype=float)
+    return rows[-candles:]
+
+def write_artifact(watchlist_file, interval, frames, candles=ARTIFACT_CANDLES):
+    """ Save the artifact of a watchlist from {ticker: OHLCV DataFrame}. """
+    array_path, index_path = artifact_paths(watchlist_file)
+    parts, tickers, start = [], {}, 0
+    for ticker, data in frames.items():
+        rows = artifact_rows(data, interval, candles)
+        parts.append(rows)
+        tickers[ticker] = [start, start + len(rows)]
+        start += len(rows)
+    array = np.concatenate(parts) if parts else np.empty(0, dtype=ARTIFACT)
+    np.save(array_path, array)
+    with open(index_path, 'w') as f:
+        json.dump({'interval': interval, 'tickers': tickers,
+                   'tags': CANDLE_TAGS, 'cycles': CYCLE_STATES}, f)
+    return array_path
+
+def read_artifact(watchlist_file):
+    """ (memory-mapped ARTIFACT array, index) of a watchlist, None if it has no artifact. """
+    array_path, index_path = artifact_paths(watchlist_file)
+    if not (os.path.exists(array_path) and os.path.exists(index_path)):
+        return None
+    with open(index_path) as f:
+        index = json.load(f)
+    return np.load(array_path, mmap_mode='r'), index
+
+def artifact_frame(array, index, ticker):
+    """ OHLCV DataFrame of a ticker with its Tag, Phase, Cycle and Squeeze columns. """
+    start, end = index['tickers'][ticker]
+    rows = array[start:end]
+    df = records_to_frame(rows)
+    df['Tag'] = np.asarray(index['tags'])[rows['tag']]
+    df['Phase'] = np.array(rows['phase'], dtype=float)
+    df['Cycle'] = np.asarray(index['cycles'])[rows['cycle']]
+    df['Squeeze'] = np.array(rows['squeeze'])
+    return df
@@ -0,0 +1,156 @@
+"""
+Historical backtest of the reversal pattern signals.
+
+The full signal series of a history comes from relativeCandlesReversalSignals
+in one vectorized pass. Every signal with enough candles after it is scored
+per horizon (in candles): its forward return from the signal candle's close,
+signed so a sell signal profits when the price falls, whether that return is
+positive (a hit), and its drawdown, the worst adverse move of the lows (highs
+for sells) before the horizon ends.
+
+Histories are read from the local candle store and scored on a process pool;
+each worker returns summable statistics (see STATS) which are merged per
+interval, so any number of symbols can be studied without holding their
+candles at once.
+
+    python backtest.py --intervals 1h 4h 1d --horizons 1 3 6 12 24 --processes 4
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from indicators import relativeCandlesReversalSignals
+from klines import RECORD, records_to_frame
+from ranges import OHLCRanges
+from store import STORE_DIR
+
+# Signal value -> name
+SIGNALS = {1: 'buy', 2: 'doubtful buy', -1: 'sell', -2: 'doubtful sell'}
+DEFAULT_HORIZONS = [1, 3, 6, 12, 24]
+DEFAULT_BATCH = 16  # Histories per worker task
+
+# Statistics of one (signal, horizon): all summed when merging except the worst drawdown
+STATS = np.dtype([
+    ('count', 'i8'),
+    ('returns', 'f8'),  # Sum of signed forward returns
+    ('squares', 'f8'),  # Sum of their squares
+    ('hits', 'i8'),  # Signals with a positive signed return
+    ('drawdowns', 'f8'),  # Sum of drawdowns (<= 0)
+    ('worst', 'f8'),  # Worst drawdown
+])
+
+def emptyStats(horizons):
+    """ (signals x horizons) STATS array with nothing counted. """
+    stats = np.zeros((len(SIGNALS), len(horizons)), dtype=STATS)
+    stats['worst'] = 0.0
+    return stats
+
+def mergeStats(a, b):
+    merged = a.copy()
+    for field in STATS.names:
+        if field == 'worst':
+            merged[field] = np.minimum(a[field], b[field])
+        else:
+            merged[field] = a[field] + b[field]
+    return merged
+
+def backtestFrame(data, horizons=DEFAULT_HORIZONS):
+    """ STATS of every signal type and horizon on one OHLC DataFrame. """
+    stats = emptyStats(horizons)
+    signals = relativeCandlesReversalSignals(data)
+    close = data['Close'].to_numpy(dtype=float)
+    # Lowest Low / highest High of the candles after a signal, one lookup each
+    ranges = OHLCRanges(data, ignore_nan=False)
+    n = close.shape[0]
+    for j, horizon in enumerate(horizons):
+        if n <= horizon:
+            continue
+        for k, signal in enumerate(SIGNALS):
+            idx = np.flatnonzero(signals[:n - horizon] == signal)
+            if not idx.shape[0]:
+                continue
+            entry = close[idx]
+            if signal > 0:
+                returns = close[idx + horizon] / entry - 1
+                drawdowns = np.minimum(ranges.low(idx + 1, idx + 1 + horizon) / entry - 1, 0)
+            else:
+                returns = 1 - close[idx + horizon] / entry
+                drawdowns = np.minimum(1 - ranges.high(idx + 1, idx + 1 + horizon) / entry, 0)
+            stats[k, j] = (idx.shape[0], returns.sum(), (returns ** 2).sum(), (returns > 0).sum(),
+                           drawdowns.sum(), drawdowns.min())
+    return stats
+
+def backtestFiles(paths, horizons=DEFAULT_HORIZONS):
+    """ Worker entry point: merged STATS of store files, leaving out a kline still open. """
+    stats = emptyStats(horizons)
+    now = time.time() * 1000
+    for path in paths:
+        records = np.fromfile(path, dtype=RECORD)
+        records = records[records['close_time'] < now]
+        stats = mergeStats(stats, backtestFrame(records_to_frame(records), horizons))
+    return stats
+
+def backtestStore(root=STORE_DIR, intervals=('1h', '4h', '1d'), horizons=DEFAULT_HORIZONS,
+                  processes=None, batch_size=DEFAULT_BATCH):
+    """ {interval: STATS} over every symbol stored for each interval. """
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {}
+        for interval in intervals:
+            paths = sorted(glob.glob(os.path.join(root, interval, '*.bin')))
+            futures[interval] = [executor.submit(backtestFiles, paths[i:i+batch_size], horizons)
+                                 for i in range(0, len(paths), batch_size)]
+        for interval, interval_futures in futures.items():
+            stats = emptyStats(horizons)
+            for future in interval_futures:
+                stats = mergeStats(stats, future.result())
+            results[interval] = stats
+    return results
+
+def summarize(stats, horizons):
+    """ {signal name: {horizon: summary}} of a STATS array. """
+    summary = {}
+    for k, name in enumerate(SIGNALS.values()):
+        summary[name] = {}
+        for j, horizon in enumerate(horizons):
+            s = stats[k, j]
+            count = int(s['count'])
+            mean = float(s['returns']) / count if count else None
+            summary[name][horizon] = {
+                'count': count,
+                'mean_return': mean,
+                'std_return': float(np.sqrt(max(s['squares'] / count - mean ** 2, 0))) if count else None,
+                'hit_rate': int(s['hits']) / count if count else None,
+                'mean_drawdown': float(s['drawdowns']) / count if count else None,
+                'worst_drawdown': float(s['worst']) if count else None,
+            }
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest reversal pattern signals on the local candle store.")
+    parser.add_argument('--store', default=STORE_DIR, help="Local candle store directory")
+    parser.add_argument('--intervals', nargs='+', default=['1h', '4h', '1d'])
+    parser.add_argument('--horizons', type=int, nargs='+', default=DEFAULT_HORIZONS, help="Forward candles")
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH, help="Histories per worker task")
+    parser.add_argument('--output', default='backtest.json', help="Where to write the statistics")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    results = backtestStore(args.store, args.intervals, args.horizons, args.processes, args.batch_size)
+    report = {interval: summarize(stats, args.horizons) for interval, stats in results.items()}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+
+    for interval, summary in report.items():
+        print(f"\n{interval:>4s} {'signal':14s} {'horizon':>7s} {'count':>8s} {'mean':>8s} "
+              f"{'hit rate':>8s} {'mean dd':>8s} {'worst dd':>8s}")
+        for name, horizons in summary.items():
+            for horizon, s in horizons.items():
+                if s['count']:
+                    print(f"{'':4s} {name:14s} {horizon:7d} {s['count']:8d} {s['mean_return']:8.2%} "
+                          f"{s['hit_rate']:8.1%} {s['mean_drawdown']:8.2%} {s['worst_drawdown']:8.2%}")
+    print(f"\nBacktest done in {time.perf_counter() - t0:.1f}s, statistics written to {args.output}")
@@ -0,0 +1,188 @@
+"""
+Indicator benchmark and equivalence suite.
+
+Times every indicator on seeded synthetic data (see synthetic.REGIMES) for a
+range of sizes and records the best time and peak memory of each call to a
+JSON file. Results can be saved as a baseline and later runs compared against
+it, failing when a function gets slower than the allowed ratio.
+
+--check compares indicator outputs on fixed datasets against the golden
+outputs in benchmarks/golden.json, so an optimization can be shown to leave
+results unchanged. Discrete outputs must match exactly, float outputs within
+a tight tolerance.
+
+    python benchmark.py --sizes 100 1000 10000 --output bench.json
+    python benchmark.py --save-baseline
+    python benchmark.py --baseline benchmarks/baseline.json --threshold 1.25
+    python benchmark.py --check
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import indicators
+from synthetic import randomOHLC, REGIMES
+
+BENCH_DIR = 'benchmarks'
+GOLDEN_FILE = os.path.join(BENCH_DIR, 'golden.json')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+GOLDEN_BARS = 1000
+DEFAULT_THRESHOLD = 1.25  # Allowed slowdown ratio against the baseline
+MIN_REGRESSION_SECONDS = 1e-3  # Ignore regressions on calls faster than this
+
+# name -> (function of the OHLCV DataFrame, whether its output is discrete)
+FUNCTIONS = {
+    'relativePositionOfCandles': (indicators.relativePositionOfCandles, True),
+    'relativeCandlesPhases': (indicators.relativeCandlesPhases, True),
+    'relativeCandlesReversalSignals': (indicators.relativeCandlesReversalSignals, True),
+    'relativeCandlesReversalPatterns': (indicators.relativeCandlesReversalPatterns, True),
+    'Cycles': (indicators.Cycles, True),
+    'trendingCycleSignals': (indicators.trendingCycleSignals, True),
+    'squeeze': (indicators.squeeze, False),
+    'linear_regression': (lambda data: indicators.linear_regression(data['Close'], 20), False),
+}
+
+def dataset(regime, bars, seed=0):
+    """ Benchmark input: 2 decimals so equal Highs/Lows happen. """
+    return randomOHLC(bars, seed=seed, regime=regime, decimals=2)
+
+def timeCall(function, data, repeats):
+    """ Best wall time of `repeats` calls, then peak traced memory of one call. """
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    function(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def runBenchmarks(sizes, regimes=REGIMES, functions=None):
+    results = []
+    for bars in sizes:
+        repeats = max(1, min(5, 100_000 // bars))
+        for regime in regimes:
+            data = dataset(regime, bars)
+            for name in functions or FUNCTIONS:
+                seconds, peak = timeCall(FUNCTIONS[name][0], data, repeats)
+                results.append({'function': name, 'regime': regime, 'bars': bars,
+                                'seconds': seconds, 'peak_bytes': peak})
+                print(f"{name:32s} {regime:9s} {bars:>9,d} bars  {seconds * 1000:10.3f} ms  "
+                      f"{peak / 2**20:8.2f} MiB", flush=True)
+    return results
+
+def compareBaseline(results, baseline, threshold):
+    """ Entries slower than `threshold` times their baseline. """
+    reference = {(entry['function'], entry['regime'], entry['bars']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        base = reference.get((entry['function'], entry['regime'], entry['bars']))
+        if base is None or entry['seconds'] < MIN_REGRESSION_SECONDS:
+            continue
+        ratio = entry['seconds'] / base['seconds']
+        if ratio > threshold:
+            regressions.append({**entry, 'baseline_seconds': base['seconds'], 'ratio': ratio})
+    return regressions
+
+def outputSignature(output, discrete):
+    """ Comparable summary of an indicator output. """
+    if discrete:
+        values = np.asarray(output if np.ndim(output) else [output]).astype(str)
+        return {'length': int(values.shape[0]),
+                'sha256': hashlib.sha256('\n'.join(values).encode()).hexdigest()}
+    values = np.asarray(output, dtype=float)
+    samples = np.linspace(0, values.shape[0] - 1, 16).astype(int)
+    return {'length': int(values.shape[0]),
+            'sum': float(np.nansum(values)),
+            'abs_sum': float(np.nansum(np.abs(values))),
+            'nans': int(np.isnan(values).sum()),
+            'samples': [None if np.isnan(v) else float(v) for v in values[samples]]}
+
+def goldenOutputs():
+    golden = {}
+    for regime in REGIMES:
+        data = dataset(regime, GOLDEN_BARS)
+        for name, (function, discrete) in FUNCTIONS.items():
+            golden[f"{name}/{regime}"] = outputSignature(function(data), discrete)
+    return golden
+
+def signaturesMatch(found, expected, rtol=1e-9, atol=1e-9):
+    if found.keys() != expected.keys():
+        return False
+    for key, value in expected.items():
+        if key == 'samples':
+            a = np.array([np.nan if v is None else v for v in found[key]])
+            b = np.array([np.nan if v is None else v for v in value])
+            if not np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True):
+                return False
+        elif isinstance(value, float):
+            if not np.isclose(found[key], value, rtol=rtol, atol=atol):
+                return False
+        elif found[key] != value:
+            return False
+    return True
+
+def checkGolden(path=GOLDEN_FILE):
+    """ Compare current outputs with the golden file, returns the mismatching keys. """
+    with open(path) as f:
+        expected = json.load(f)
+    found = goldenOutputs()
+    return [key for key in expected if key not in found or not signaturesMatch(found[key], expected[key])]
+
+def writeJson(path, content):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(content, f, indent=1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and check the indicators.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--regimes', nargs='+', default=list(REGIMES), choices=REGIMES)
+    parser.add_argument('--functions', nargs='+', default=None, choices=list(FUNCTIONS))
+    parser.add_argument('--output', default='bench_results.json', help="Where to write timings")
+    parser.add_argument('--baseline', default=None, help="Compare timings against this file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true', help=f"Also write timings to {BASELINE_FILE}")
+    parser.add_argument('--check', action='store_true', help="Only run the golden output checks")
+    parser.add_argument('--update-golden', action='store_true', help="Rewrite the golden outputs")
+    args = parser.parse_args()
+
+    if args.update_golden:
+        writeJson(GOLDEN_FILE, goldenOutputs())
+        print(f"Golden outputs written to {GOLDEN_FILE}")
+        sys.exit(0)
+
+    if args.check:
+        mismatches = checkGolden()
+        for key in mismatches:
+            print(f"MISMATCH {key}")
+        print(f"{len(mismatches)} golden output mismatches")
+        sys.exit(1 if mismatches else 0)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': runBenchmarks(args.sizes, args.regimes, args.functions),
+    }
+    writeJson(args.output, report)
+    if args.save_baseline:
+        writeJson(BASELINE_FILE, report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compareBaseline(report['results'], json.load(f), args.threshold)
+        for entry in regressions:
+            print(f"REGRESSION {entry['function']} {entry['regime']} {entry['bars']} bars: "
+                  f"{entry['ratio']:.2f}x baseline")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,135 @@
+"""
+Pooled, rate limited access to the Binance REST API.
+
+All requests go through one requests.Session so connections are reused, and a
+shared RateLimiter keeps the client under the exchange request-weight limit
+using the X-MBX-USED-WEIGHT-1M header it reports back. 429 (rate limited) and
+418 (IP banned) responses pause every worker for the Retry-After delay before
+the request is retried.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+
+BASE_URL = "https://api.binance.com"
+WEIGHT_LIMIT = 1200  # Request weight allowed per minute
+WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1M"
+DEFAULT_WORKERS = 8
+
+# Kline interval lengths in milliseconds ('1M' is not fixed so it is left out)
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000,
+    '1w': 604_800_000,
+}
+
+class RateLimiter:
+    """
+    Client side view of the request weight used in the current minute.
+
+    acquire() blocks until a request of the given weight fits in the window,
+    update() syncs with the weight the exchange reports and handles backoff.
+    """
+    def __init__(self, weight_limit=WEIGHT_LIMIT, window=60):
+        self.weight_limit = weight_limit
+        self.window = window
+        self.used = 0
+        self.window_end = 0
+        self.blocked_until = 0
+        self.condition = threading.Condition()
+
+    def _roll(self, now):
+        if now >= self.window_end:
+            self.used = 0
+            self.window_end = (now // self.window + 1) * self.window
+
+    def acquire(self, weight=1):
+        with self.condition:
+            while True:
+                now = time.time()
+                self._roll(now)
+                if now < self.blocked_until:
+                    self.condition.wait(self.blocked_until - now)
+                elif self.used + weight > self.weight_limit:
+                    self.condition.wait(self.window_end - now)
+                else:
+                    self.used += weight
+                    return
+
+    def update(self, response):
+        """ Read weight and backoff headers from a response. """
+        with self.condition:
+            now = time.time()
+            self._roll(now)
+            used = response.headers.get(WEIGHT_HEADER)
+            if used is not None:
+                self.used = max(self.used, int(used))
+            if response.status_code in (418, 429):
+                retry_after = float(response.headers.get("Retry-After", self.window))
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+                logging.warning(f"Rate limited by exchange ({response.status_code}), backing off {retry_after}s.")
+            self.condition.notify_all()
+
+class BinanceClient:
+    """ Thread safe client sharing one connection pool and one rate limiter. """
+    def __init__(self, base_url=BASE_URL, pool_size=DEFAULT_WORKERS, limiter=None, max_retries=3, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path, params=None, weight=1):
+        """ GET an API path, retrying after 429/418 backoff. Returns the response. """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.count('retries')
+            self.limiter.acquire(weight)
+            try:
+                with metrics.timer('http_request'):
+                    response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                metrics.count('errors')
+                raise
+            metrics.count('requests')
+            metrics.count('weight', weight)
+            metrics.count('bytes', len(response.content))
+            self.limiter.update(response)
+            if response.status_code not in (418, 429):
+                break
+        if not response.ok:
+            metrics.count('errors')
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        self.session.close()
+
+def fetch_concurrently(fetch, jobs, max_workers=DEFAULT_WORKERS):
+    """
+    Run fetch(*job) for every job on a bounded thread pool.
+
+    Yields (job, result) pairs as they complete. At most 2 * max_workers jobs
+    are in flight so results are consumed while the rest are still queued.
+    """
+    jobs = iter(jobs)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        while True:
+            for job in jobs:
+                pending[executor.submit(fetch, *job)] = job
+                if len(pending) >= 2 * max_workers:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
@@ -0,0 +1,83 @@
+"""
+Watchlist criteria and the plan that evaluates them lazily.
+
+A criterion is a named list of conditions (indicator, operator, value) that
+must all hold; a ticker goes on the watchlist when any criterion holds. Each
+indicator declares how many trailing candles its last value depends on, so a
+Plan knows the smallest kline `limit` to request, computes only the
+indicators the criteria use, and stops at the first failing condition.
+
+    plan = Plan([Criterion('buy sequence', [('reversal_pattern', '==', 1)])])
+    plan.lookback  # 5
+    plan.evaluate(data)  # 'buy sequence' or None
+"""
+import operator
+from collections import namedtuple
+from metrics import metrics
+from indicators import relativeCandlesReversalPatterns, relativeCandlesPhases, Cycles, trendingCycles
+
+# name -> (function of the OHLC DataFrame giving its last value, candles it
+# depends on or None when it depends on the whole history)
+INDICATORS = {
+    'reversal_pattern': (relativeCandlesReversalPatterns, 5),
+    'phase': (lambda data: relativeCandlesPhases(data)[-1], None),
+    'cycle': (lambda data: Cycles(data).iloc[-1], None),
+    'trend': (trendingCycles, None),  # 1: two cycles up, -1: two cycles down
+}
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda a, b: a in b,
+}
+
+Criterion = namedtuple('Criterion', ['name', 'conditions'])
+
+# Buy or sell sequence on the last candle
+CRITERIA = [
+    Criterion('buy sequence', [('reversal_pattern', '==', 1)]),
+    Criterion('sell sequence', [('reversal_pattern', '==', -1)]),
+]
+
+class Plan:
+    """ Indicators and history needed by a list of criteria. """
+    def __init__(self, criteria=CRITERIA):
+        for criterion in criteria:
+            for name, op, _ in criterion.conditions:
+                if name not in INDICATORS:
+                    raise ValueError(f"Unknown indicator {name!r} in {criterion.name!r}")
+                if op not in OPERATORS:
+                    raise ValueError(f"Unknown operator {op!r} in {criterion.name!r}")
+        self.criteria = criteria
+        # Used indicators, in order of first use
+        self.indicators = list(dict.fromkeys(name for criterion in criteria
+                                             for name, _, _ in criterion.conditions))
+        lookbacks = [INDICATORS[name][1] for name in self.indicators]
+        self.lookback = None if None in lookbacks else max(lookbacks, default=0)
+
+    def history(self, default):
+        """ Klines to fetch: the lookback, or `default` when the whole history matters. """
+        return default if self.lookback is None else self.lookback
+
+    def evaluate(self, data, values=None):
+        """
+        Name of the first criterion `data` meets, None if it meets none.
+
+        Indicators are computed on first use; `values` may hold already
+        computed ones (e.g. from worker processes) and is filled in.
+        """
+        values = {} if values is None else values
+        for criterion in self.criteria:
+            for name, op, value in criterion.conditions:
+                if name not in values:
+                    with metrics.timer(f'indicator.{name}'):
+                        values[name] = INDICATORS[name][0](data)
+                if not OPERATORS[op](values[name], value):
+                    break
+            else:
+                return criterion.name
+        return None
@@ -0,0 +1,109 @@
+"""
+Process pool evaluation of tickers, kept apart from network I/O.
+
+The indicator FSMs are pure Python loops holding the GIL, so they are run in
+worker processes. Candles are shipped in batches as one float64 buffer plus
+offsets (see packBatch) instead of pickled DataFrames.
+
+Run this module directly to measure scaling from 1 to N processes.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from indicators import (
+    relativeCandlesReversalPatterns, relativeCandlesPhases, cycleCodes, trendingCycleSignals, CYCLE_STATES,
+)
+from ranges import OHLCRanges
+from criteria import INDICATORS
+
+DEFAULT_BATCH = 32
+COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+def packBatch(frames):
+    """
+    Pack (key, DataFrame) pairs into (keys, values, offsets).
+
+    values is a (4, total candles) float64 array of OHLC, the candles of the
+    k-th frame are values[:, offsets[k]:offsets[k+1]].
+    """
+    keys = [key for key, _ in frames]
+    offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+    np.cumsum([len(frame) for _, frame in frames], out=offsets[1:])
+    values = np.empty((len(COLUMNS), offsets[-1]))
+    for (_, frame), a, b in zip(frames, offsets[:-1], offsets[1:]):
+        for row, column in enumerate(COLUMNS):
+            values[row, a:b] = frame[column].to_numpy(dtype=float)
+    return keys, values, offsets
+
+def analyze(data, indicators=tuple(INDICATORS)):
+    """
+    {name: last value} of the criteria `indicators` (see criteria.INDICATORS).
+
+    Phases and the range index are computed once for the indicators sharing
+    them, and only when one of `indicators` needs them.
+    """
+    values = {}
+    if 'phase' in indicators or 'cycle' in indicators or 'trend' in indicators:
+        phases = relativeCandlesPhases(data)
+        if 'phase' in indicators:
+            values['phase'] = phases[-1]
+        if 'cycle' in indicators or 'trend' in indicators:
+            ranges = OHLCRanges(data)
+            if 'cycle' in indicators:
+                values['cycle'] = CYCLE_STATES[cycleCodes(data, phases, ranges)[-1]]
+            if 'trend' in indicators:
+                values['trend'] = int(trendingCycleSignals(data, phases, ranges)[-1])
+    if 'reversal_pattern' in indicators:
+        values['reversal_pattern'] = relativeCandlesReversalPatterns(data)
+    for name in indicators:
+        if name not in values:
+            values[name] = INDICATORS[name][0](data)
+    return values
+
+def evaluateBatch(keys, values, offsets, indicators=tuple(INDICATORS)):
+    """
+    Worker entry point: [(key, {indicator: value})] for a packed batch.
+
+    A ticker that fails to evaluate gets None instead of failing the batch.
+    """
+    results = []
+    for key, a, b in zip(keys, offsets[:-1], offsets[1:]):
+        data = pd.DataFrame(values[:, a:b].T, columns=COLUMNS)
+        try:
+            results.append((key, analyze(data, indicators)))
+        except Exception:
+            results.append((key, None))
+    return results
+
+def evaluateFrames(frames, processes, batch_size=DEFAULT_BATCH, indicators=tuple(INDICATORS)):
+    """ Evaluate (key, DataFrame) pairs on a process pool, results in input order. """
+    frames = list(frames)
+    batches = [frames[i:i+batch_size] for i in range(0, len(frames), batch_size)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(evaluateBatch, *packBatch(batch), indicators) for batch in batches]
+        return [result for future in futures for result in future.result()]
+
+if __name__ == "__main__":
+    from synthetic import randomFrames
+
+    parser = argparse.ArgumentParser(description="Measure evaluation scaling over processes.")
+    parser.add_argument('--tickers', type=int, default=400)
+    parser.add_argument('--bars', type=int, default=1000)
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH)
+    args = parser.parse_args()
+
+    frames = list(randomFrames(args.tickers, args.bars, decimals=2).items())
+    reference = None
+    for processes in range(1, args.max_processes + 1):
+        t0 = time.perf_counter()
+        results = evaluateFrames(frames, processes, args.batch_size)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference, base = results, elapsed
+        assert results == reference, "Results depend on the number of processes"
+        print(f"{processes:3d} processes: {elapsed:7.3f}s  {args.tickers / elapsed:8.1f} tickers/s  "
+              f"speedup {base / elapsed:5.2f}x")
@@ -0,0 +1,180 @@
+"""
+Indexed history of the watchlist signals.
+
+Every watchlist a scan produces is a run (scan time, timeframe, exported
+file) with one row per listed symbol: its reversal signal, cycle state (from
+the criteria, else from the scan artifact) and the close time of the candle
+it was found on.
+Rows are indexed by symbol, timeframe and close time, so questions such as
+when a symbol last fired are one index lookup instead of reading every
+watchlist file.
+
+export_watchlist() writes a run in the watchlist_<tf>_<ts>.txt format the
+rest of the tools read, import_watchlists() loads existing text files.
+
+    python history.py --symbol BTCUSDT --timeframe 1h --since 2024-01-01
+    python history.py --latest 1h
+    python history.py --import "watchlists/watchlist_*.txt"
+"""
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+HISTORY_FILE = os.path.join('watchlists', 'history.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,  -- Scan time (ms)
+    timeframe TEXT NOT NULL,
+    file TEXT  -- Exported watchlist file
+);
+CREATE TABLE IF NOT EXISTS signals (
+    run INTEGER NOT NULL REFERENCES runs(id),
+    timeframe TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    signal INTEGER,  -- relativeCandlesReversalPatterns value
+    cycle TEXT,  -- Cycles state, NULL when not computed
+    close_time INTEGER  -- Close time (ms) of the candle the signal was found on
+);
+CREATE INDEX IF NOT EXISTS runs_timeframe ON runs (timeframe, time);
+CREATE INDEX IF NOT EXISTS signals_symbol ON signals (symbol, timeframe, close_time);
+CREATE INDEX IF NOT EXISTS signals_time ON signals (timeframe, close_time);
+CREATE INDEX IF NOT EXISTS signals_run ON signals (run);
+"""
+
+WATCHLIST_NAME = re.compile(r'watchlist_(?P<timeframe>\w+?)_(?P<timestamp>\d{8}_\d{4})\.txt$')
+
+class SignalHistory:
+    """ SQLite store of watchlist runs and their signals. """
+    def __init__(self, path=HISTORY_FILE):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def record(self, timeframe, rows, run_time=None, file=None):
+        """
+        Save a watchlist, rows are (symbol, signal, cycle, close time) in
+        watchlist order. Returns the run id.
+        """
+        with self.db:
+            run = self.db.execute("INSERT INTO runs (time, timeframe, file) VALUES (?, ?, ?)",
+                                  (int(run_time if run_time is not None else time.time() * 1000),
+                                   timeframe, file)).lastrowid
+            self.db.executemany(
+                "INSERT INTO signals (run, timeframe, symbol, signal, cycle, close_time) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run, timeframe, symbol, signal, cycle, close_time) for symbol, signal, cycle, close_time in rows])
+        return run
+
+    def set_cycles(self, run, cycles):
+        """ Fill in the cycle state of symbols recorded without one in a run, from {symbol: cycle}. """
+        with self.db:
+            self.db.executemany("UPDATE signals SET cycle = ? WHERE run = ? AND symbol = ? AND cycle IS NULL",
+                                [(cycle, run, symbol) for symbol, cycle in cycles.items()])
+
+    def run(self, run):
+        return self.db.execute("SELECT * FROM runs WHERE id = ?", (run,)).fetchone()
+
+    def latest_run(self, timeframe=None):
+        """ Last run, of a timeframe if given (None when there is none). """
+        if timeframe:
+            return self.db.execute("SELECT * FROM runs WHERE timeframe = ? ORDER BY time DESC, id DESC LIMIT 1",
+                                   (timeframe,)).fetchone()
+        return self.db.execute("SELECT * FROM runs ORDER BY time DESC, id DESC LIMIT 1").fetchone()
+
+    def watchlist(self, run):
+        """ Symbols of a run in watchlist order. """
+        return [row['symbol'] for row in
+                self.db.execute("SELECT symbol FROM signals WHERE run = ? ORDER BY rowid", (run,))]
+
+    def signals(self, symbol=None, timeframe=None, start=None, end=None):
+        """ Signal rows matching a symbol, timeframe and close time range [start, end) (ms), oldest first. """
+        conditions, params = [], []
+        for clause, value in (("symbol = ?", symbol), ("timeframe = ?", timeframe),
+                              ("close_time >= ?", start), ("close_time < ?", end)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.db.execute(f"SELECT * FROM signals {where} ORDER BY close_time, rowid", params).fetchall()
+
+    def last_signal(self, symbol, timeframe=None):
+        """ Most recent signal row of a symbol (None if it never fired). """
+        if timeframe:
+            return self.db.execute("SELECT * FROM signals WHERE symbol = ? AND timeframe = ? "
+                                   "ORDER BY close_time DESC, rowid DESC LIMIT 1", (symbol, timeframe)).fetchone()
+        return self.db.execute("SELECT * FROM signals WHERE symbol = ? ORDER BY close_time DESC, rowid DESC LIMIT 1",
+                               (symbol,)).fetchone()
+
+    def export_watchlist(self, run, path):
+        """ Write a run as a watchlist text file (one symbol per line) and remember where. """
+        with open(path, 'w') as f:
+            for symbol in self.watchlist(run):
+                f.write(f"{symbol}\n")
+        with self.db:
+            self.db.execute("UPDATE runs SET file = ? WHERE id = ?", (path, run))
+        return path
+
+    def import_watchlists(self, pattern):
+        """ Load existing watchlist_<tf>_<ts>.txt files (signals unknown), returns the runs added. """
+        known = {row['file'] for row in self.db.execute("SELECT file FROM runs WHERE file IS NOT NULL")}
+        runs = []
+        for path in sorted(glob.glob(pattern)):
+            match = WATCHLIST_NAME.search(os.path.basename(path))
+            if not match or path in known:
+                continue
+            run_time = datetime.strptime(match['timestamp'], "%Y%m%d_%H%M").timestamp() * 1000
+            with open(path) as f:
+                symbols = [line.strip() for line in f if line.strip()]
+            runs.append(self.record(match['timeframe'], [(symbol, None, None, None) for symbol in symbols],
+                                    run_time, path))
+        return runs
+
+def format_time(ms):
+    return datetime.fromtimestamp(ms / 1000).strftime('%Y-%m-%d %H:%M') if ms is not None else '-'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the watchlist signal history.")
+    parser.add_argument('--history', default=HISTORY_FILE, help="History database")
+    parser.add_argument('--symbol', default=None)
+    parser.add_argument('--timeframe', default=None)
+    parser.add_argument('--since', default=None, help="Start date (YYYY-MM-DD[ HH:MM])")
+    parser.add_argument('--until', default=None, help="End date (YYYY-MM-DD[ HH:MM])")
+    parser.add_argument('--latest', default=None, metavar='TIMEFRAME', help="Print the latest watchlist")
+    parser.add_argument('--export', type=int, default=None, metavar='RUN', help="Export a run as a text file")
+    parser.add_argument('--output', default=None, help="File for --export")
+    parser.add_argument('--import', dest='import_pattern', default=None, metavar='PATTERN',
+                        help="Import existing watchlist text files")
+    args = parser.parse_args()
+
+    history = SignalHistory(args.history)
+    if args.import_pattern:
+        print(f"Imported {len(history.import_watchlists(args.import_pattern))} watchlists")
+    elif args.export is not None:
+        run = history.run(args.export)
+        if run is None:
+            raise SystemExit(f"No run {args.export}")
+        timestamp = datetime.fromtimestamp(run['time'] / 1000).strftime("%Y%m%d_%H%M")
+        print(history.export_watchlist(run['id'], args.output or f"watchlist_{run['timeframe']}_{timestamp}.txt"))
+    elif args.latest:
+        run = history.latest_run(args.latest)
+        if run is None:
+            raise SystemExit(f"No {args.latest} watchlist")
+        print(f"Run {run['id']} at {format_time(run['time'])} ({run['file']}):")
+        print("\n".join(history.watchlist(run['id'])))
+    else:
+        since = datetime.fromisoformat(args.since).timestamp() * 1000 if args.since else None
+        until = datetime.fromisoformat(args.until).timestamp() * 1000 if args.until else None
+        for row in history.signals(args.symbol, args.timeframe, since, until):
+            print(f"{format_time(row['close_time'])}  {row['timeframe']:>3s}  {row['symbol']:12s}  "
+                  f"signal {row['signal'] if row['signal'] is not None else '-':>2}  cycle {row['cycle'] or '-'}")
+    history.close()
@@ -1,6 +1,107 @@
 
+import logging
 import numpy as np
 import pandas as pd
+from ranges import OHLCRanges
+from kernels import Kernel, jitable
+
+# Candle tags as compact integer codes, CANDLE_TAGS[code] gives the tag name.
+CANDLE_TAGS = ('X', 'U', 'D', 'RU', 'RD', 'RU2', 'RD2', 'I', 'I2')
+TAG_X, TAG_U, TAG_D, TAG_RU, TAG_RD, TAG_RU2, TAG_RD2, TAG_I, TAG_I2 = range(len(CANDLE_TAGS))
+
+# Position of a candle relative to the previous one (input of the tagging FSM).
+(BAR_UP, BAR_DOWN, BAR_INSIDE, BAR_INSIDE2,
+ BAR_OUTSIDE_GREEN, BAR_OUTSIDE_RED, BAR_OUTSIDE_DOJI, BAR_NONE) = range(8)
+
+# TAG_TRANSITIONS[previous tag, bar class] -> new tag
+TAG_TRANSITIONS = np.array([
+    #  UP       DOWN     INSIDE   INSIDE2  OUT_G     OUT_R     OUT_DOJI  NONE
+    [TAG_U,  TAG_D,  TAG_I, TAG_I2, TAG_RU2, TAG_RD2, TAG_X,  TAG_X],  # X
+    [TAG_U,  TAG_RD, TAG_I, TAG_I2, TAG_RU,  TAG_RU,  TAG_RU, TAG_X],  # U
+    [TAG_RU, TAG_D,  TAG_I, TAG_I2, TAG_RU,  TAG_RU,  TAG_RU, TAG_X],  # D
+    [TAG_U,  TAG_RD, TAG_I, TAG_I2, TAG_RU2, TAG_RD2, TAG_X,  TAG_X],  # RU
+    [TAG_RU, TAG_D,  TAG_I, TAG_I,  TAG_RU2, TAG_RD2, TAG_X,  TAG_X],  # RD
+    [TAG_U,  TAG_RD, TAG_I, TAG_I2, TAG_RU2, TAG_RD2, TAG_X,  TAG_X],  # RU2
+    [TAG_RU, TAG_D,  TAG_I, TAG_I,  TAG_RU2, TAG_RD2, TAG_X,  TAG_X],  # RD2
+    [TAG_RU, TAG_RD, TAG_I2, TAG_I2, TAG_RU2, TAG_RD2, TAG_X, TAG_X],  # I
+    [TAG_RU, TAG_RD, TAG_I2, TAG_I2, TAG_RU2, TAG_RD2, TAG_X, TAG_X],  # I2
+], dtype=np.int8)
+
+def candleBarClasses(data):
+    """
+    Classify every candle against the previous one in a single vectorized pass.
+
+    Returns an int8 array of BAR_* codes. The first candle is always BAR_NONE.
+    """
+    return barClasses(data['Open'].to_numpy(), data['High'].to_numpy(),
+                      data['Low'].to_numpy(), data['Close'].to_numpy())
+
+def barClasses(open_, high, low, close):
+    """
+    candleBarClasses over OHLC arrays, candles along the last axis.
+
+    Works on a single history (1D) or a panel of them (tickers x bars).
+    """
+    high = np.asarray(high)
+    low = np.asarray(low)
+    classes = np.full(high.shape, BAR_NONE, dtype=np.int8)
+    if high.shape[-1] < 2:
+        return classes
+
+    hh = np.zeros(high.shape, dtype=bool)
+    lh = np.zeros(high.shape, dtype=bool)
+    hl = np.zeros(high.shape, dtype=bool)
+    ll = np.zeros(high.shape, dtype=bool)
+    hh[..., 1:] = high[..., 1:] > high[..., :-1]
+    lh[..., 1:] = high[..., :-1] > high[..., 1:]
+    hl[..., 1:] = low[..., 1:] > low[..., :-1]
+    ll[..., 1:] = low[..., :-1] > low[..., 1:]
+
+    inside = lh & hl
+    outside = hh & ll
+    inside_prev = np.zeros(high.shape, dtype=bool)
+    inside_prev[..., 1:] = inside[..., :-1]
+    green = np.asarray(close) > np.asarray(open_)
+    red = np.asarray(close) < np.asarray(open_)
+
+    classes[hh & hl] = BAR_UP
+    classes[lh & ll] = BAR_DOWN
+    classes[inside] = BAR_INSIDE
+    classes[inside & inside_prev] = BAR_INSIDE2
+    classes[outside] = BAR_OUTSIDE_DOJI
+    classes[outside & green] = BAR_OUTSIDE_GREEN
+    classes[outside & red] = BAR_OUTSIDE_RED
+    return classes
+
+def candleTagCodes(data):
+    """
+    Same tags as relativePositionOfCandles but as an int8 array of TAG_* codes.
+
+    Comparison masks are computed once for the whole history, the FSM then only
+    does one table lookup per candle.
+    """
+    return tagKernel(candleBarClasses(data))
+
+def _tagsPython(classes):
+    classes = classes.tolist()
+    codes = [TAG_X] * len(classes)
+    table = TAG_TRANSITIONS.tolist()
+    state = TAG_X
+    for i in range(2, len(classes)):
+        state = table[state][classes[i]]
+        codes[i] = state
+    return np.array(codes, dtype=np.int8)
+
+def _tagsCompiled(classes):
+    codes = np.full(classes.shape[0], TAG_X, dtype=np.int8)
+    state = TAG_X
+    for i in range(2, classes.shape[0]):
+        state = TAG_TRANSITIONS[state, classes[i]]
+        codes[i] = state
+    return codes
+
+# TAG_* code of every candle from its BAR_* class (see kernels.py)
+tagKernel = Kernel(_tagsPython, _tagsCompiled)
 
 def relativePositionOfCandles(data):
     """
@@ -11,107 +112,131 @@ def relativePositionOfCandles(data):
 
     States are defined based on position relative to previous candlestick (Higher Highs or Lower Lows etc).
     """
-    state = ['X' for i in range(data.shape[0])]
-
-    # Identify state for each candle based on previous candle's state
-    for i in range(2, data.shape[0]):
-        if state[i-1] == 'X':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'U'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'D'
-            elif LH(data, i) and HL(data, i):
-                if LH(data, i-1) and HL(data, i-1):
-                    state[i] = 'I2'
-                else:
-                    state[i] = 'I'
-            elif HH(data, i) and LL(data, i):
-                if greenCandle(data, i):
-                    state[i] = 'RU2'
-                elif redCandle(data, i):
-                    state[i] = 'RD2'
-        elif state[i-1] == 'U':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'U'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'RD'
-            elif LH(data, i) and HL(data, i):
-                if LH(data, i-1) and HL(data, i-1):
-                    state[i] = 'I2'
-                else:
-                    state[i] = 'I'
-            elif HH(data, i) and LL(data, i):
-                state[i] = 'RU'
-        elif state[i-1] == 'D':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'RU'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'D'
-            elif LH(data, i) and HL(data, i):
-                if LH(data, i-1) and HL(data, i-1):
-                    state[i] = 'I2'
-                else:
-                    state[i] = 'I'
-            elif HH(data, i) and LL(data, i):
-                state[i] = 'RU'
-        elif state[i-1] == 'RU' or state[i-1] == 'RU2':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'U'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'RD'
-            elif LH(data, i) and HL(data, i):
-                if LH(data, i-1) and HL(data, i-1):
-                    state[i] = 'I2'
-                else:
-                    state[i] = 'I'
-            elif HH(data, i) and LL(data, i):
-                if greenCandle(data, i):
-                    state[i] = 'RU2'
-                elif redCandle(data, i):
-                    state[i] = 'RD2'
-        elif state[i-1] == 'RD' or state[i-1] == 'RD2':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'RU'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'D'
-            elif LH(data, i) and HL(data, i):
-                if LH(data, i-1) and HL(data, i-1):
-                    state[i] = 'I'
-                else:
-                    state[i] = 'I'
-            elif HH(data, i) and LL(data, i):
-                if greenCandle(data, i):
-                    state[i] = 'RU2'
-                elif redCandle(data, i):
-                    state[i] = 'RD2'
-        elif state[i-1] == 'I':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'RU'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'RD'
-            elif LH(data, i) and HL(data, i):
-                state[i] = 'I2'
-            elif HH(data, i) and LL(data, i):
-                if greenCandle(data, i):
-                    state[i] = 'RU2'
-                elif redCandle(data, i):
-                    state[i] = 'RD2'
-        elif state[i-1] == 'I2':
-            if HH(data, i) and HL(data, i):
-                state[i] = 'RU'
-            elif LH(data, i) and LL(data, i):
-                state[i] = 'RD'
-            elif LH(data, i) and HL(data, i):
-                state[i] = 'I2'
-            elif HH(data, i) and LL(data, i):
-                if greenCandle(data, i):
-                    state[i] = 'RU2'
-                elif redCandle(data, i):
-                    state[i] = 'RD2'
-        else:
-            print(f"Strategy FSM in unkown state: {state[i]}")
-            exit()
-    return state
+    return [CANDLE_TAGS[code] for code in candleTagCodes(data)]
+
+# Sequence rules over the last three candle tags (state2, state1, state0).
+# None matches any tag. Groups are listed by precedence, first match wins.
+# Adding a rule only means adding a tuple here.
+REVERSAL_SEQUENCES = [
+    # Buy sequences
+    (1, [
+        (None, 'D',  'RU'),
+        ('D',  'I',  'RU'),
+        (None, 'RD', 'RU'),
+        ('RD', 'I',  'RU'),
+    ]),
+    # Doubtful buy sequences
+    (2, [
+        # (None, 'D',  'RU2'),
+        (None, 'D',  'RD2'),
+        # ('D',  'I',  'RU2'),
+        ('D',  'I',  'RD2'),
+        # (None, 'RD', 'RU2'),
+        (None, 'RD', 'RD2'),
+        # ('RD', 'I',  'RU2'),
+        ('RD', 'I',  'RD2'),
+    ]),
+    # Sell sequences
+    (-1, [
+        (None, 'U',  'RD'),
+        ('U',  'I',  'RD'),
+        (None, 'RU', 'RD'),
+        ('RU', 'I',  'RD'),
+    ]),
+    # Doubtful sell sequences
+    (-2, [
+        # (None, 'U',  'RD2'),
+        (None, 'U',  'RU2'),
+        # ('U',  'I',  'RD2'),
+        ('U',  'I',  'RU2'),
+        # (None, 'RU', 'RD2'),
+        (None, 'RU', 'RU2'),
+        # ('RU', 'I',  'RD2'),
+        ('RU', 'I',  'RU2'),
+    ]),
+]
+
+PHASE_SEQUENCES = [
+    # Phase up
+    (1, [
+        (None,  'D',   'RU'),
+        ('D',   'I',   'RU'),
+        (None,  'D',   'RU2'),
+        ('D',   'I',   'RU2'),
+        (None,  'RD',  'RU'),
+        ('RD',  'I',   'RU'),
+        (None,  'RD',  'RU2'),
+        ('RD',  'I',   'RU2'),
+        (None,  'RD2', 'RU'),
+        ('RD2', 'I',   'RU'),
+        (None,  'RD2', 'RU2'),
+        ('RD2', 'I',   'RU2'),
+        ('I',   'I2',  'RU'),
+        ('I',   'I2',  'RU2'),
+    ]),
+    # Phase down
+    (-1, [
+        (None,  'U',   'RD'),
+        ('U',   'I',   'RD'),
+        (None,  'U',   'RD2'),
+        ('U',   'I',   'RD2'),
+        (None,  'RU',  'RD'),
+        ('RU',  'I',   'RD'),
+        (None,  'RU',  'RD2'),
+        ('RU',  'I',   'RD2'),
+        (None,  'RU2', 'RD'),
+        ('RU2', 'I',   'RD'),
+        (None,  'RU2', 'RD2'),
+        ('RU2', 'I',   'RD2'),
+        ('I',   'I2',  'RD'),
+        ('I',   'I2',  'RD2'),
+    ]),
+]
+
+def compileSequences(rules):
+    """
+    Compile sequence rules into a lookup table indexed by encoded tag triplets.
+
+    table[state2, state1, state0] gives the value of the first matching rule, 0 if none.
+    """
+    ntags = len(CANDLE_TAGS)
+    table = np.zeros((ntags, ntags, ntags), dtype=np.int8)
+    # Fill lowest precedence first so earlier groups overwrite later ones
+    for value, sequences in reversed(rules):
+        for state2, state1, state0 in sequences:
+            s2 = slice(None) if state2 is None else CANDLE_TAGS.index(state2)
+            table[s2, CANDLE_TAGS.index(state1), CANDLE_TAGS.index(state0)] = value
+    return table
+
+REVERSAL_TABLE = compileSequences(REVERSAL_SEQUENCES)
+PHASE_TABLE = compileSequences(PHASE_SEQUENCES)
+
+def forwardFill(values):
+    """ Replace zeros by the last non zero value before them (along the last axis). """
+    idx = np.where(values != 0, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    return np.take_along_axis(values, idx, axis=-1)
+
+def relativeCandlesReversalSignals(data):
+    """
+    Reversal pattern value for every candle (see relativeCandlesReversalPatterns).
+
+    Each value matches what relativeCandlesReversalPatterns returns when given the
+    history up to that candle: tags are re-derived from a fresh FSM over the last
+    5 candles, which only takes three table lookups per candle.
+    """
+    classes = candleBarClasses(data).astype(np.intp)
+    n = classes.shape[0]
+    signals = np.zeros(n, dtype=np.int8)
+    if n < 3:
+        return signals
+
+    i = np.arange(2, n)
+    state2 = np.where(i >= 4, TAG_TRANSITIONS[TAG_X, classes[i-2]], TAG_X)
+    state1 = np.where(i >= 3, TAG_TRANSITIONS[state2, classes[i-1]], TAG_X)
+    state0 = TAG_TRANSITIONS[state1, classes[i]]
+    signals[2:] = REVERSAL_TABLE[state2, state1, state0]
+    return signals
 
 def relativeCandlesReversalPatterns( data):
     """
@@ -125,54 +250,8 @@ def relativeCandlesReversalPatterns( data):
         -2 when there is a doubtful sell sequence,
 
     """
-    tags = relativePositionOfCandles(data.iloc[-5:])
-    state2, state1, state0 = tags[-3], tags[-2], tags[-1]
-    buy_sequences = [
-        state1 == 'D'  and state0 == 'RU',
-        state2 == 'D'  and state1 == 'I' and state0 == 'RU',
-        state1 == 'RD' and state0 == 'RU',
-        state2 == 'RD' and state1 == 'I' and state0 == 'RU',
-    ]
-
-    buy_doubtful_sequences = [
-        # state1 == 'D'  and state0 == 'RU2',
-        state1 == 'D'  and state0 == 'RD2',
-        # state2 == 'D'  and state1 == 'I' and state0 == 'RU2',
-        state2 == 'D'  and state1 == 'I' and state0 == 'RD2',
-        # state1 == 'RD' and state0 == 'RU2',
-        state1 == 'RD' and state0 == 'RD2',
-        # state2 == 'RD' and state1 == 'I' and state0 == 'RU2',
-        state2 == 'RD' and state1 == 'I' and state0 == 'RD2',
-    ]
-
-    sell_sequences = [
-        state1 == 'U'  and state0 == 'RD',
-        state2 == 'U'  and state1 == 'I' and state0 == 'RD',
-        state1 == 'RU' and state0 == 'RD',
-        state2 == 'RU' and state1 == 'I' and state0 == 'RD',
-    ]
-
-    sell_doubtful_sequences = [
-        # state1 == 'U'  and state0 == 'RD2',
-        state1 == 'U'  and state0 == 'RU2',
-        # state2 == 'U'  and state1 == 'I' and state0 == 'RD2',
-        state2 == 'U'  and state1 == 'I' and state0 == 'RU2',
-        # state1 == 'RU' and state0 == 'RD2',
-        state1 == 'RU' and state0 == 'RU2',
-        # state2 == 'RU' and state1 == 'I' and state0 == 'RD2',
-        state2 == 'RU' and state1 == 'I' and state0 == 'RU2',
-    ]
-
-    if any(buy_sequences):
-        return 1
-    elif any(buy_doubtful_sequences):
-        return 2
-    elif any(sell_sequences):
-        return -1
-    elif any(sell_doubtful_sequences):
-        return -2
-    else:
-        return 0
+    tags = candleTagCodes(data.iloc[-5:])
+    return int(REVERSAL_TABLE[tags[-3], tags[-2], tags[-1]])
 
 def relativeCandlesPhases( data, **args):
     """
@@ -180,79 +259,14 @@ def relativeCandlesPhases( data, **args):
     args:
         data
     """
-    tags = relativePositionOfCandles(data)
+    tags = candleTagCodes(data).astype(np.intp)
     phase = np.zeros(data.shape[0])
-    
+    if phase.shape[0] == 0:
+        return phase
+
+    phase[3:] = PHASE_TABLE[tags[1:-2], tags[2:-1], tags[3:]]
     phase[0] = 1 if greenCandle(data,0) else -1
-    for i in range(1, 3):
-        phase[i] = phase[i-1]
-
-    for i in range(3,data.shape[0]):
-        # up_sequences = [
-        #     tags[i-2]=='RU' and tags[i-1]=='I' and tags[i]=='RU',
-        #     tags[i-2]=='RU' and tags[i-1]=='I' and tags[i]=='RU2',
-        #     tags[i-1]=='RU' and tags[i]=='U',
-        #     tags[i-1]=='RU' and tags[i]=='RU2',
-        #     tags[i-2]=='RU2' and tags[i-1]=='I' and tags[i]=='RU',
-        #     tags[i-2]=='RU2' and tags[i-1]=='I' and tags[i]=='RU2',
-        #     tags[i-1]=='RU2' and tags[i]=='U',
-        #     tags[i-1]=='RU2' and tags[i]=='RU2',
-        # ]
-        # down_sequences = [
-        #     tags[i-2]=='RD' and tags[i-1]=='I' and tags[i]=='RD',
-        #     tags[i-2]=='RD' and tags[i-1]=='I' and tags[i]=='RD2',
-        #     tags[i-1]=='RD' and tags[i]=='D',
-        #     tags[i-1]=='RD' and tags[i]=='RD2',
-        #     tags[i-2]=='RD2' and tags[i-1]=='I' and tags[i]=='RD',
-        #     tags[i-2]=='RD2' and tags[i-1]=='I' and tags[i]=='RD2',
-        #     tags[i-1]=='RD2' and tags[i]=='D',
-        #     tags[i-1]=='RD2' and tags[i]=='RD2',
-        # ]
-        state2, state1, state0 = tags[i-2], tags[i-1], tags[i]
-        up_sequences = [
-            state1 == 'D'  and state0 == 'RU',
-            state2 == 'D'  and state1 == 'I' and state0 == 'RU',
-            state1 == 'D'  and state0 == 'RU2',
-            state2 == 'D'  and state1 == 'I' and state0 == 'RU2',
-            state1 == 'RD' and state0 == 'RU',
-            state2 == 'RD' and state1 == 'I' and state0 == 'RU',
-            state1 == 'RD' and state0 == 'RU2',
-            state2 == 'RD' and state1 == 'I' and state0 == 'RU2',
-            state1 == 'RD2' and state0 == 'RU',
-            state2 == 'RD2' and state1 == 'I' and state0 == 'RU',
-            state1 == 'RD2' and state0 == 'RU2',
-            state2 == 'RD2' and state1 == 'I' and state0 == 'RU2',
-            state2 == 'I' and state1 == 'I2' and state0 == 'RU',
-            state2 == 'I' and state1 == 'I2' and state0 == 'RU2',
-
-        ]
-
-        down_sequences = [
-            state1 == 'U'  and state0 == 'RD',
-            state2 == 'U'  and state1 == 'I' and state0 == 'RD',
-            state1 == 'U'  and state0 == 'RD2',
-            state2 == 'U'  and state1 == 'I' and state0 == 'RD2',
-            state1 == 'RU' and state0 == 'RD',
-            state2 == 'RU' and state1 == 'I' and state0 == 'RD',
-            state1 == 'RU' and state0 == 'RD2',
-            state2 == 'RU' and state1 == 'I' and state0 == 'RD2',
-            state1 == 'RU2' and state0 == 'RD',
-            state2 == 'RU2' and state1 == 'I' and state0 == 'RD',
-            state1 == 'RU2' and state0 == 'RD2',
-            state2 == 'RU2' and state1 == 'I' and state0 == 'RD2',
-            state2 == 'I' and state1 == 'I2' and state0 == 'RD',
-            state2 == 'I' and state1 == 'I2' and state0 == 'RD2',
-        ]
-
-        # Check phase up sequence:
-        if any(up_sequences):
-            phase[i] = 1
-        # Check phase down sequence:
-        elif any(down_sequences):
-            phase[i] = -1
-        else:
-            phase[i] = phase[i-1]
-    return phase
+    return forwardFill(phase)
 
 def phaseChanges( data, nphases=4):
     """
@@ -274,179 +288,236 @@ def phaseChanges( data, nphases=4):
 
     return [0] + indexes[::-1]
 
+# Cycle states as compact integer codes, CYCLE_STATES[code] gives the state name.
+# X = unknown. Only used at start
+CYCLE_STATES = ('X', 'A', 'B', 'CC', 'C', 'D', '-A', '-B', '-CC', '-C', '-D')
+(CYCLE_X, CYCLE_A, CYCLE_B, CYCLE_CC, CYCLE_C, CYCLE_D,
+ CYCLE_NA, CYCLE_NB, CYCLE_NCC, CYCLE_NC, CYCLE_ND) = range(len(CYCLE_STATES))
+
+def _fmin(a, b):
+    """ NaN ignoring min of two floats (like np.fmin) """
+    return b if (a != a or b < a) else a
+
+def _fmax(a, b):
+    """ NaN ignoring max of two floats (like np.fmax) """
+    return b if (a != a or b > a) else a
+
+def cycleTransition(state, phase, last, first):
+    """
+    One step of the Cycles FSM.
+
+    args:
+        state: current CYCLE_* code
+        phase: phase of the new candle (1 or -1)
+        last: (low before, high before, low since, high since) the last phase boundary
+        first: same for the second to last boundary, or the last one if there is
+            only one. None when no boundary has been seen yet.
+    """
+    if first is None:
+        return cycleStep(state, phase, *last, np.nan, np.nan, np.nan, np.nan, False)
+    return cycleStep(state, phase, *last, *first, True)
+
+@jitable
+def cycleStep(state, phase, low_before, high_before, low_since, high_since,
+              first_low_before, first_high_before, first_low_since, first_high_since, known):
+    """ cycleTransition on scalars, `known` is False when there is no `first` boundary. """
+    if state == CYCLE_A:
+        if phase == 1:
+            state = CYCLE_A
+        elif phase == -1:
+            state = CYCLE_B
+
+    elif state == CYCLE_B:
+        if not known:
+            raise IndexError("Cycles: no phase change before state B")
+        minA, minB = first_low_before, first_low_since
+        if minA < minB:
+            if phase == 1:
+                state = CYCLE_CC
+            elif phase == -1:
+                state = CYCLE_B
+        else:
+            state = CYCLE_NA
+
+    elif state == CYCLE_CC:
+        if high_since > high_before:
+            state = CYCLE_C
+        elif phase == 1:
+            state = CYCLE_CC
+        elif phase == -1:
+            state = CYCLE_NCC
+
+    elif state == CYCLE_C:
+        if phase == 1:
+            state = CYCLE_C
+        elif phase == -1:
+            state = CYCLE_D
+
+    elif state == CYCLE_D:
+        if low_before < low_since:
+            if phase == 1:
+                state = CYCLE_CC
+            elif phase == -1:
+                state = CYCLE_D
+        else:
+            state = CYCLE_NA
+
+    elif state == CYCLE_NA:
+        if phase == 1:
+            state = CYCLE_NB
+        elif phase == -1:
+            state = CYCLE_NA
+
+    elif state == CYCLE_NB:
+        if not known:
+            raise IndexError("Cycles: no phase change before state -B")
+        maxA, maxB = first_high_before, first_high_since
+        if maxA < maxB:
+            if phase == 1:
+                state = CYCLE_NB
+            elif phase == -1:
+                state = CYCLE_A
+        else:
+            state = CYCLE_NCC
+
+    elif state == CYCLE_NCC:
+        if low_since < low_before:
+            state = CYCLE_NC
+        elif phase == 1:
+            state = CYCLE_CC
+        elif phase == -1:
+            state = CYCLE_NCC
+
+    elif state == CYCLE_NC:
+        if phase == 1:
+            state = CYCLE_ND
+        elif phase == -1:
+            state = CYCLE_NC
+
+    elif state == CYCLE_ND:
+        if high_before > high_since:
+            if phase == 1:
+                state = CYCLE_ND
+            elif phase == -1:
+                state = CYCLE_NCC
+        else:
+            state = CYCLE_A
+
+    elif state == CYCLE_X:
+        if phase == 1:
+            state = CYCLE_A
+        elif phase == -1:
+            state = CYCLE_NA
+
+    return state
+
+def cycleCodes(data, phases=None, ranges=None):
+    """
+    Cycles indicator as an int8 array of CYCLE_* codes, in a single forward pass.
+
+    Only the last two phase boundaries (as found by phaseChanges) matter. The
+    Low/High before and since each of them are range queries (see ranges.py)
+    answered for every candle up front, so the pass itself only steps the FSM.
+    `ranges` may be an OHLCRanges of `data` already built.
+    """
+    if phases is None:
+        phases = relativeCandlesPhases(data)
+    phases = np.asarray(phases)
+    n = phases.shape[0]
+    codes = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return codes
+    if ranges is None:
+        ranges = OHLCRanges(data)
+
+    i = np.arange(n)
+    # Candles starting a new phase, known from the candle after them on
+    # (phaseChanges ignores a change between candles 0 and 1)
+    changes = np.flatnonzero(phases[2:] != phases[1:-1]) + 2
+    count = np.searchsorted(changes, i - 1, side='right')
+    padded = np.r_[0, changes, 0]
+    # Last two boundaries, or the last one twice (0 before the first boundary)
+    last = padded[count]
+    first = padded[np.maximum(count - 1, 1)]
+
+    def extrema(p):
+        """ Low before, High before, Low since and High since boundary p, for every candle """
+        before = np.maximum(p, 1)
+        return np.array([np.where(p > 0, ranges.low(0, before), np.nan),
+                         np.where(p > 0, ranges.high(0, before), np.nan),
+                         ranges.low(p, i + 1), ranges.high(p, i + 1)])
+
+    codes[:] = cycleKernel(phases.astype(float), extrema(last),
+                           extrema(np.where(count > 0, first, 0)), count > 0)
+    return codes
+
+def _cyclesPython(phases, last, first, known):
+    states = []
+    state = CYCLE_X
+    for phase, l0, l1, l2, l3, f0, f1, f2, f3, known_ in zip(phases.tolist(), *last.tolist(), *first.tolist(),
+                                                            known.tolist()):
+        state = cycleStep(state, phase, l0, l1, l2, l3, f0, f1, f2, f3, known_)
+        states.append(state)
+    return np.array(states, dtype=np.int8)
+
+def _cyclesCompiled(phases, last, first, known):
+    codes = np.empty(phases.shape[0], dtype=np.int8)
+    state = CYCLE_X
+    for j in range(phases.shape[0]):
+        state = cycleStep(state, phases[j], last[0, j], last[1, j], last[2, j], last[3, j],
+                          first[0, j], first[1, j], first[2, j], first[3, j], known[j])
+        codes[j] = state
+    return codes
+
+# CYCLE_* code of every candle from its phase and boundary extrema (see kernels.py)
+cycleKernel = Kernel(_cyclesPython, _cyclesCompiled)
+
 def Cycles( data) -> pd.Series:
     """ Cycles Indicator by Marc Goulding.
 
     Cycles:   A    B    CC    C    D
                 -A   -B   -CC   -C   -D
+
+    Returns a categorical series (codes follow CYCLE_STATES).
+    """
+    return pd.Series(pd.Categorical.from_codes(cycleCodes(data), categories=CYCLE_STATES))
+
+def trendingCycleSignals(data, phases=None, ranges=None):
     """
-    possible_states = [
-            "A",    "B",    "CC",    "C",    "D",
-        "-A",   "-B",   "-CC",   "-C",   "-D", "X"  #  X = unknown. Only used at start
-    ]
-
-    phases = relativeCandlesPhases(data)
-
-    current_state = "X"
-
-    cycles = pd.Series(
-        np.zeros(data.shape[0])
-    ).astype(str)
-
-
-    for i in range(0, data.shape[0]):
-        if current_state == "A":
-            if phases[i] == 1:
-                current_state = "A"
-                cycles[i] = current_state
-            elif phases[i] == -1:
-                current_state = "B"
-                cycles[i] = current_state
-
-        elif current_state == "B":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 2)
-            minA = data.iloc[phaseIndexes[0]:phaseIndexes[1]]['Low'].min()
-            try:
-                minB = data.iloc[phaseIndexes[1]:i+1]['Low'].min()
-            except IndexError:
-                minB = data.iloc[phaseIndexes[1]:]['Low'].min()
-
-            if minA < minB:
-                if phases[i] == 1:
-                    current_state = "CC"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "B"
-                    cycles[i] = current_state
-            else:
-                current_state = "-A"
-                cycles[i] = current_state
-
-        elif current_state == "CC":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 3)
-            try:
-                maxCC = data.iloc[phaseIndexes[-1]:i+1]['High'].max()
-            except IndexError:
-                maxCC = data.iloc[phaseIndexes[-1]:]['High'].max()
-            maxAB = data.iloc[phaseIndexes[0]:phaseIndexes[-1]]['High'].max()
-            if maxCC > maxAB:
-                current_state = "C"
-                cycles[i] = current_state
-            else:
-                if phases[i] == 1:
-                    current_state = "CC"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "-CC"
-                    cycles[i] = current_state
-
-        elif current_state == "C":
-            if phases[i] == 1:
-                current_state = "C"
-                cycles[i] = current_state
-            elif phases[i] == -1:
-                current_state = "D"
-                cycles[i] = current_state
-
-        elif current_state == "D":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 3)
-            minBC = data.iloc[phaseIndexes[0]:phaseIndexes[-1]]['Low'].min()
-            try:
-                minD = data.iloc[phaseIndexes[-1]:i+1]['Low'].min()
-            except IndexError:
-                minD = data.iloc[phaseIndexes[-1]:]['Low'].min()
-            if minBC < minD:
-                if phases[i] == 1:
-                    current_state = "CC"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "D"
-                    cycles[i] = current_state
-            else:
-                current_state = "-A"
-                cycles[i] = current_state
-
-        elif current_state == "-A":
-            if phases[i] == 1:
-                current_state = "-B"
-                cycles[i] = current_state
-            elif phases[i] == -1:
-                current_state = "-A"
-                cycles[i] = current_state
-
-        elif current_state == "-B":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 2)
-            try:
-                maxB = data.iloc[phaseIndexes[1]:i+1]['High'].max()
-            except IndexError:
-                maxB = data.iloc[phaseIndexes[1]:]['High'].max()
-            maxA = data.iloc[phaseIndexes[0]:phaseIndexes[1]]['High'].max()
-            if maxA < maxB:
-                if phases[i] == 1:
-                    current_state = "-B"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "A"
-                    cycles[i] = current_state
-            else:
-                current_state = "-CC"
-                cycles[i] = current_state
-
-        elif current_state == "-CC":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 3)
-            try:
-                minCC = data.iloc[phaseIndexes[-1]:i+1]['Low'].min()
-            except IndexError:
-                minCC = data.iloc[phaseIndexes[-1]:]['Low'].min()
-            minAB = data.iloc[phaseIndexes[0]:phaseIndexes[-1]]['Low'].min()
-            if minCC < minAB:
-                current_state = "-C"
-                cycles[i] = current_state
-            else:
-                if phases[i] == 1:
-                    current_state = "CC"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "-CC"
-                    cycles[i] = current_state
-
-        elif current_state == "-C":
-            if phases[i] == 1:
-                current_state = "-D"
-                cycles[i] = current_state
-            elif phases[i] == -1:
-                current_state = "-C"
-                cycles[i] = current_state
-
-        elif current_state == "-D":
-            phaseIndexes = phaseChanges(phases[:i], nphases = 3)
-            try:
-                maxD = data.iloc[phaseIndexes[-1]:i+1]['High'].max()
-            except IndexError:
-                maxD = data.iloc[phaseIndexes[-1]:]['High'].max()
-            maxBC = data.iloc[phaseIndexes[0]:phaseIndexes[-1]]['High'].max()
-
-            if maxBC > maxD:
-                if phases[i] == 1:
-                    current_state = "-D"
-                    cycles[i] = current_state
-                elif phases[i] == -1:
-                    current_state = "-CC"
-                    cycles[i] = current_state
-            else:
-                current_state = "A"
-                cycles[i] = current_state
-
-        elif current_state == "X":
-
-            if phases[i] == 1:
-                current_state = "A"
-                cycles[i] = current_state
-            elif phases[i] == -1:
-                current_state = "-A"
-                cycles[i] = current_state
-
-    return cycles
+    trendingCycles value for every candle, in a single forward pass.
+
+    Phases are split into runs at every change. For a candle in run r, the
+    two newest phases are run r-1 and run r up to that candle, the two oldest
+    are runs r-3 and r-2. Their Highs/Lows are range queries (see ranges.py),
+    `ranges` may be an OHLCRanges of `data` already built.
+    The first run has no known start, so candles need 4 phases after it.
+    """
+    if phases is None:
+        phases = relativeCandlesPhases(data)
+    phases = np.asarray(phases)
+    n = phases.shape[0]
+    trend = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return trend
+    if ranges is None:
+        ranges = OHLCRanges(data)
+
+    run = np.zeros(n, dtype=np.intp)
+    np.cumsum(phases[1:] != phases[:-1], out=run[1:])
+    starts = np.flatnonzero(np.r_[True, phases[1:] != phases[:-1]])
+
+    i = np.flatnonzero(run >= 4)
+    r = run[i]
+    old_high = ranges.high(starts[r-3], starts[r-1])
+    old_low = ranges.low(starts[r-3], starts[r-1])
+    new_high = ranges.high(starts[r-1], i + 1)
+    new_low = ranges.low(starts[r-1], i + 1)
+    # Higher Highs and Higher Lows, during the phase 2 (going down) of the uptrend
+    up = (phases[i] == -1) & (old_high < new_high) & (old_low < new_low)
+    # Lower Highs and Lower Lows, during the phase 2 (going up) of the downtrend
+    down = (phases[i] == 1) & (old_high > new_high) & (old_low > new_low)
+    trend[i] = np.where(up, 1, np.where(down, -1, 0))
+    return trend
 
 def trendingCycles( data):
     """
@@ -456,63 +527,9 @@ def trendingCycles( data):
 
     Only gives cycles during a phase 2 in the trend.
     If next phase 1 in trend has begun it will return False until phase 2 begins.
+    (only returns one value for last candle, see trendingCycleSignals)
     """
-    class Phase:
-        def __init__(self):
-            self.min = -1
-            self.max = -1
-        def updateMax(self, high):
-            if high>self.max:
-                self.max = high
-        def updateMin(self, low):
-            if low<self.min:
-                self.min = low
-
-    phases = phases(data)
-
-    i = data.shape[0]-1
-    state = 4  # FSM state to read last 4 phases in data
-    phase = [Phase() for i in range(4)]
-    phase[state-1].max = data.iloc[i]['High']
-    phase[state-1].min = data.iloc[i]['Low']
-
-    while state > 0:
-        i -= 1
-        if phases[i] == phases[i+1]:
-            phase[state-1].updateMax(data.iloc[i]['High'])
-            phase[state-1].updateMin(data.iloc[i]['Low'])
-        else:
-            state -= 1
-            if state == 0:
-                break
-            phase[state-1].max = data.iloc[i]['High']
-            phase[state-1].min = data.iloc[i]['Low']
-
-    up_conditions = [
-        # Last phase is an uptrend phase 2 going down
-        phases[-1] == -1,
-        # Higher Highs
-        max(phase[0].max, phase[1].max) < max(phase[2].max, phase[3].max),
-        # Higher Lows
-        min(phase[0].min, phase[1].min) < min(phase[2].min, phase[3].min),
-    ]
-    down_conditions = [
-        # Last phase is a downtrend phase 2 going up
-        phases[-1] == 1,
-        # Lower Highs
-        max(phase[0].max, phase[1].max) > max(phase[2].max, phase[3].max),
-        # Lower Lows
-        min(phase[0].min, phase[1].min) > min(phase[2].min, phase[3].min),
-    ]
-
-    # Check 2 cycles up
-    if all(up_conditions):
-        return -1
-    # Check 2 cycles down
-    elif all(down_conditions):
-        return 1
-    else:
-        return 0
+    return int(trendingCycleSignals(data)[-1])
 
 def HH(data, i) -> bool:
     """ Last 2 candles make a Higher High """
@@ -560,14 +577,28 @@ def linear_regression(series, period):
     Returns:
         pd.Series: The linear regression values for the given period.
     """
+    values = np.asarray(series, dtype=float)
+    regression = np.full(values.shape[0], np.nan)
+    if values.shape[0] >= period:
+        # Endpoint of the fitted line is a fixed weighted sum of the window,
+        # so all windows come from a single convolution.
+        regression[period-1:] = np.convolve(values, linregWeights(period)[::-1], mode='valid')
+    return pd.Series(regression, index=series.index)
+
+def linregWeights(period):
+    """
+    Weights w such that w @ y is the value at the last point of the least
+    squares line fitted to y (len(y) == period).
+    """
+    if period == 1:
+        return np.ones(1)
     x = np.arange(period)  # Create an array of indexes for the lookback period
-    
-    def linreg(y):
-        # Perform linear regression using least squares fit
-        slope, intercept = np.polyfit(x, y, 1)  # degree 1 means a linear fit
-        return slope * (period - 1) + intercept  # return the value of the regression line at the last point
-    
-    return series.rolling(window=period).apply(linreg, raw=True)
+    dx = x - x.mean()
+    return 1 / period + dx * dx[-1] / (dx @ dx)
+
+def linregLast(y):
+    """ Value at the last point of the least squares line fitted to y. """
+    return float(linregWeights(len(y)) @ y)
 
 def SMA(data, period):
     """
@@ -582,19 +613,33 @@ def SMA(data, period):
     """
     return data.rolling(window=period).mean()
 
-def squeeze(data, period=20):
+def squeeze(data, period=20, ranges=None):
     """
     Squeeze Indicator from TradingView by LazyBear.
 
     Parameters:
     data (pd.DataFrame): OHLCV data with 'High', 'Low', 'Close' columns.
     period (int): The lookback period for calculating the squeeze indicator.
+    ranges (OHLCRanges): Range index of data, built if not given.
 
     Returns:
     pd.Series: A series of squeeze indicator values.
     """
-    highest_high = data['High'].rolling(period).max()
-    lowest_low = data['Low'].rolling(period).min()
+    if ranges is None:
+        ranges = OHLCRanges(data)
+    n = data.shape[0]
+    highest_high = np.full(n, np.nan)
+    lowest_low = np.full(n, np.nan)
+    if n >= period:
+        end = np.arange(period, n + 1)
+        highest_high[period-1:] = ranges.high(end - period, end)
+        lowest_low[period-1:] = ranges.low(end - period, end)
+        # Like rolling(period), a window with a missing value gives NaN
+        missing = np.r_[0, np.cumsum(np.isnan(np.asarray(data['High'], dtype=float))
+                                     | np.isnan(np.asarray(data['Low'], dtype=float)))]
+        highest_high[period-1:][missing[end] > missing[end - period]] = np.nan
+    highest_high = pd.Series(highest_high, index=data.index)
+    lowest_low = pd.Series(lowest_low, index=data.index)
     
     # Ensure the SMA uses the 'Close' prices
     midline = (highest_high + lowest_low) / 2
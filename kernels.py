@@ -0,0 +1,96 @@
+"""
+Backends of the candle state machine kernels.
+
+The tagging and Cycles FSMs step from one candle to the next, so they are
+loops over int8 state arrays rather than NumPy expressions. Each Kernel has a
+plain Python implementation and a variant compiled with Numba (`pip install
+numba`) on first use. The backend is chosen by one switch: the KERNEL_BACKEND
+environment variable ('numba' or 'python', default 'numba' when Numba is
+installed, anything else falls back to 'python' with a warning) or
+setBackend(), which also applies to worker processes started afterwards.
+
+Run this module directly to check both backends give identical output and
+compare their speed.
+"""
+import logging
+import os
+import time
+import numpy as np
+
+try:
+    import numba
+    from numba.extending import register_jitable
+except ImportError:  # Optional, the kernels then run as plain Python
+    numba = None
+
+BACKENDS = ('python', 'numba')
+
+def setBackend(name):
+    """ Run the kernels on `name` ('python' or 'numba'). """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown kernel backend {name!r}, expected one of {BACKENDS}")
+    if name == 'numba' and numba is None:
+        raise ValueError("The numba kernel backend needs numba installed")
+    backend = os.environ['KERNEL_BACKEND'] = name
+
+def jitable(func):
+    """ Plain Python function that compiled kernels may call as well. """
+    return register_jitable(func) if numba else func
+
+class Kernel:
+    """ A loop with a Python implementation and its source for the compiled backend. """
+    def __init__(self, python, compiled):
+        self.python = python
+        self.source = compiled
+        self.compiled = None
+
+    def __call__(self, *args):
+        if backend == 'numba':
+            if self.compiled is None:
+                self.compiled = numba.njit(cache=True)(self.source)
+            return self.compiled(*args)
+        return self.python(*args)
+
+# Read, not set, here: only setBackend() passes a choice on to worker processes
+backend = os.environ.get('KERNEL_BACKEND', 'numba' if numba else 'python')
+if backend not in BACKENDS:
+    logging.warning(f"Unknown KERNEL_BACKEND={backend!r}, expected one of {BACKENDS}, using the python kernels.")
+    backend = 'python'
+elif backend == 'numba' and numba is None:
+    logging.warning("KERNEL_BACKEND=numba but numba is not installed, using the python kernels.")
+    backend = 'python'
+
+if __name__ == "__main__":
+    import pandas as pd
+    from indicators import candleTagCodes, relativeCandlesPhases, cycleCodes
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for n in (0, 1, 2, 3, 5, 50, 500, 13_000):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+        open_ = np.r_[close[:1], close[:-1]]
+        frames.append(pd.DataFrame({'Open': open_, 'Close': close,
+                                    'High': np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n)),
+                                    'Low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))}))
+
+    def run(repeats=5):
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            results = [(candleTagCodes(data), cycleCodes(data, relativeCandlesPhases(data))) for data in frames]
+        return results, (time.perf_counter() - t0) / repeats
+
+    available = [name for name in BACKENDS if name == 'python' or numba]
+    reference = None
+    for name in available:
+        setBackend(name)
+        run(1)  # Compile
+        results, seconds = run()
+        if reference is None:
+            reference = results
+        for (tags, cycles), (ref_tags, ref_cycles) in zip(results, reference):
+            assert np.array_equal(tags, ref_tags) and np.array_equal(cycles, ref_cycles), \
+                f"{name} kernels differ from {available[0]}"
+        print(f"{name:7s} {seconds * 1000:8.2f} ms  tags + Cycles of {sum(map(len, frames)):,} candles")
+    if not numba:
+        print("numba is not installed, only the python backend was run")
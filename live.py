@@ -0,0 +1,275 @@
+"""
+Live scanning daemon driven by kline close events.
+
+A stream source is any iterable of kline stream messages (dicts in the
+exchange websocket format). WebsocketSource subscribes to the exchange,
+ReplaySource reads messages recorded one JSON object per line, e.g. by
+--record, so a session can be replayed offline.
+
+LiveScanner keeps, per (symbol, interval), the last few candles the criteria
+look at and streaming trackers (see streaming.py) for indicators that depend
+on the whole history, so a close event costs one tracker step and a few
+candles of work. It is seeded from the candle store and emits an 'add' or
+'remove' event whenever a ticker enters or leaves a watchlist.
+
+    python live.py --timeframes 1h 4h 1d
+    python live.py --replay session.jsonl --no-store
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import numpy as np
+import requests
+from binance import BinanceClient, fetch_concurrently, DEFAULT_WORKERS, INTERVAL_MS
+from store import CandleStore, STORE_DIR, DEFAULT_LIMIT
+from klines import RECORD, records_to_frame
+from criteria import Plan, INDICATORS
+from streaming import PhaseTracker, CycleTracker
+from metrics import metrics
+from universe import universe
+
+STREAM_URL = "wss://stream.binance.com:9443/stream"
+MAX_STREAMS = 1024  # Streams per websocket connection
+RECONNECT_DELAY = 5  # Seconds before reconnecting a dropped connection
+
+# Indicators kept up to date one candle at a time: name -> (tracker class,
+# its update() value -> the value the criteria compare)
+TRACKERS = {
+    'phase': (PhaseTracker, float),
+    'cycle': (CycleTracker, str),
+}
+
+def parse_kline_event(message):
+    """ (symbol, interval, RECORD row, closed) of a kline stream message, None for other messages. """
+    data = message.get('data', message)
+    if data.get('e') != 'kline':
+        return None
+    k = data['k']
+    record = np.array((k['t'], float(k['o']), float(k['h']), float(k['l']), float(k['c']),
+                       float(k['v']), k['T']), dtype=RECORD)
+    return data['s'], k['i'], record, bool(k['x'])
+
+class WebsocketSource:
+    """
+    Kline messages of every (symbol, interval) from the exchange websocket.
+
+    Streams are split over connections of at most MAX_STREAMS, each read by a
+    thread that reconnects when the connection drops. Needs websocket-client.
+    """
+    def __init__(self, symbols, intervals, url=STREAM_URL):
+        import websocket  # Only needed for the live exchange stream
+        self.websocket = websocket
+        self.url = url
+        self.messages = queue.Queue()
+        self.closed = False
+        streams = [f"{symbol.lower()}@kline_{interval}" for symbol in symbols for interval in intervals]
+        self.threads = [threading.Thread(target=self._read, args=(streams[i:i+MAX_STREAMS],), daemon=True)
+                        for i in range(0, len(streams), MAX_STREAMS)]
+        for thread in self.threads:
+            thread.start()
+
+    def _read(self, streams):
+        url = f"{self.url}?streams={'/'.join(streams)}"
+        while not self.closed:
+            app = self.websocket.WebSocketApp(url, on_message=lambda ws, message: self.messages.put(message))
+            app.run_forever(ping_interval=60)
+            if not self.closed:
+                logging.warning(f"Kline stream disconnected, reconnecting in {RECONNECT_DELAY}s...")
+                time.sleep(RECONNECT_DELAY)
+
+    def __iter__(self):
+        while not self.closed:
+            yield json.loads(self.messages.get())
+
+    def close(self):
+        self.closed = True
+
+class ReplaySource:
+    """ Kline messages recorded one JSON object per line. """
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+class LiveSymbol:
+    """ Recent candles, trackers and watchlist membership of one (symbol, interval). """
+    def __init__(self, records, window, trackers):
+        self.window = window
+        self.records = np.array(records[max(len(records) - window, 0):]) if window else records[:0]
+        self.last_time = int(records['time'][-1]) if len(records) else None
+        self.close_time = int(records['close_time'][-1]) if len(records) else None
+        self.trackers = {name: TRACKERS[name][0]() for name in trackers}
+        self.values = {}
+        if len(records) and self.trackers:
+            frame = records_to_frame(records)
+            for name, tracker in self.trackers.items():
+                self.values[name] = TRACKERS[name][1](tracker.replay(frame)[-1])
+        self.criterion = None
+
+    def update(self, record):
+        """ Add the next closed candle. """
+        self.last_time, self.close_time = int(record['time']), int(record['close_time'])
+        if self.window:
+            self.records = np.append(self.records, record)[-self.window:]
+        candle = {'Open': record['open'], 'High': record['high'], 'Low': record['low'], 'Close': record['close']}
+        self.values = {name: TRACKERS[name][1](tracker.update(candle)) for name, tracker in self.trackers.items()}
+
+class LiveScanner:
+    """
+    Watchlists kept current from kline close events.
+
+    args:
+        plan: criteria Plan deciding watchlist membership
+        store: CandleStore to seed from and keep closed klines in (None: start empty)
+        on_event: called with every watchlist event dict (default: logged)
+    """
+    def __init__(self, plan, store=None, on_event=None):
+        self.plan = plan
+        self.store = store
+        self.on_event = on_event or (lambda event: logging.info(json.dumps(event)))
+        self.trackers = [name for name in plan.indicators if name in TRACKERS]
+        # Candles needed by the indicators computed from the candles themselves
+        lookbacks = [INDICATORS[name][1] for name in plan.indicators if name not in TRACKERS]
+        full = None in lookbacks
+        self.history = DEFAULT_LIMIT if full or self.trackers else max(lookbacks, default=0)
+        self.window = DEFAULT_LIMIT if full else max(lookbacks, default=0)
+        self.symbols = {}
+
+    def watchlist(self, interval):
+        """ Symbols of an interval currently meeting a criterion. """
+        return [symbol for (symbol, tf), state in self.symbols.items() if tf == interval and state.criterion]
+
+    def seed(self, symbol, interval, update=True):
+        """ (Re)build the state of a (symbol, interval) from the store. """
+        records = np.empty(0, dtype=RECORD)
+        if self.store:
+            if update:
+                self.store.update(symbol, interval, history=self.history)
+            records = np.array(self.store.read(symbol, interval))
+            # Drop the kline still open, its close event comes from the stream
+            records = records[records['close_time'] < time.time() * 1000]
+        previous = self.symbols.get((symbol, interval))
+        state = self.symbols[(symbol, interval)] = LiveSymbol(records, self.window, self.trackers)
+        state.criterion = previous.criterion if previous else None
+        return state
+
+    def seed_all(self, symbols, intervals, workers=DEFAULT_WORKERS):
+        jobs = [(symbol, interval) for interval in intervals for symbol in symbols]
+        if self.store:
+            def update(symbol, interval):
+                try:
+                    self.store.update(symbol, interval, history=self.history)
+                except requests.exceptions.RequestException as e:
+                    logging.error(f"Error fetching {interval} data for {symbol}: {e}")
+            for _ in fetch_concurrently(update, jobs, max_workers=workers):
+                pass
+        for symbol, interval in jobs:
+            self.seed(symbol, interval, update=False)
+            self.evaluate(symbol, interval, emit=False)
+        logging.info(f"Seeded {len(jobs)} symbol/interval pairs, watching for closes...")
+
+    def evaluate(self, symbol, interval, emit=True):
+        state = self.symbols[(symbol, interval)]
+        if state.last_time is None:
+            return
+        data = records_to_frame(state.records) if self.window else None
+        try:
+            criterion = self.plan.evaluate(data, dict(state.values))
+        except Exception:
+            metrics.count('evaluation_errors')
+            logging.error(f"Error analyzing {symbol} for {interval} timeframe.")
+            return
+        if criterion != state.criterion:
+            previous, state.criterion = state.criterion, criterion
+            if emit:
+                self.on_event({'action': 'add' if criterion else 'remove', 'symbol': symbol,
+                               'interval': interval, 'criterion': criterion or previous,
+                               'time': state.close_time})
+
+    def handle(self, message):
+        """ Apply one stream message, returns True when it closed a kline. """
+        event = parse_kline_event(message)
+        if event is None or not event[3]:
+            return False
+        symbol, interval, record, _ = event
+        with metrics.timer('live.close'):
+            state = self.symbols.get((symbol, interval)) or self.seed(symbol, interval, update=False)
+            if state.last_time is not None and record['time'] <= state.last_time:
+                return False  # Already seen
+            if (state.last_time is not None and interval in INTERVAL_MS
+                    and record['time'] - state.last_time != INTERVAL_MS[interval]):
+                # Klines were missed (e.g. while reconnecting): rebuild from the store
+                logging.warning(f"Gap in {interval} klines for {symbol}, resyncing...")
+                metrics.count('live.resyncs')
+                state = self.seed(symbol, interval, update=self.store is not None)
+                if state.last_time is not None and record['time'] <= state.last_time:
+                    self.evaluate(symbol, interval)
+                    return True
+            if self.store:
+                self.store.append(symbol, interval, record[None])
+            state.update(record)
+            self.evaluate(symbol, interval)
+        metrics.count('live.closes')
+        return True
+
+    def run(self, source, record=None):
+        """ Consume a stream source until it ends, optionally recording its messages. """
+        for message in source:
+            if record:
+                record.write(json.dumps(message) + '\n')
+            self.handle(message)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+
+    parser = argparse.ArgumentParser(description="Keep watchlists current from live kline closes.")
+    parser.add_argument('--timeframes', nargs='+', default=['1h', '4h', '1d'])
+    parser.add_argument('--base-url', default=None, help="API base URL (e.g. a local stand-in server)")
+    parser.add_argument('--stream-url', default=STREAM_URL)
+    parser.add_argument('--store', default=STORE_DIR, help="Local candle store directory")
+    parser.add_argument('--no-store', action='store_true', help="Start empty instead of seeding from the store")
+    parser.add_argument('--replay', default=None, metavar='FILE', help="Replay recorded messages instead")
+    parser.add_argument('--record', default=None, metavar='FILE', help="Record stream messages to FILE")
+    parser.add_argument('--events', default=None, metavar='FILE', help="Append watchlist events to FILE")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    client = BinanceClient(**({'base_url': args.base_url} if args.base_url else {}), pool_size=args.workers)
+    events = open(args.events, 'a') if args.events else None
+
+    def on_event(event):
+        logging.info(f"{event['action'].upper()} {event['symbol']} {event['interval']} ({event['criterion']})")
+        if events:
+            events.write(json.dumps(event) + '\n')
+            events.flush()
+
+    scanner = LiveScanner(Plan(), None if args.no_store else CandleStore(client, root=args.store), on_event)
+    if args.replay:
+        source = ReplaySource(args.replay)
+    else:
+        try:
+            symbols = universe(client, os.path.join(args.store, 'exchange_info.json'))
+        except requests.exceptions.RequestException as e:
+            raise SystemExit(f"Error fetching tickers: {e}")
+        if scanner.store:
+            scanner.seed_all(symbols, args.timeframes, workers=args.workers)
+        source = WebsocketSource(symbols, args.timeframes, url=args.stream_url)
+
+    record = open(args.record, 'a') if args.record else None
+    try:
+        scanner.run(source, record)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for f in (record, events):
+            if f:
+                f.close()
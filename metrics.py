@@ -0,0 +1,64 @@
+"""
+Run metrics: stage timers and counters, written as one JSON file per run.
+
+Modules record into the shared `metrics` instance:
+
+    with metrics.timer('kline_fetch'):
+        ...
+    metrics.count('requests')
+
+Timers keep call count, total and max seconds per stage. Stages timed on
+several threads at once add up, so their total can exceed the run time.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.timers = {}  # stage -> [calls, total seconds, max seconds]
+            self.counters = {}
+
+    @contextmanager
+    def timer(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - t0)
+
+    def add_time(self, stage, seconds):
+        with self.lock:
+            timer = self.timers.setdefault(stage, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'elapsed_seconds': time.time() - self.started,
+                'timers': {stage: {'calls': calls, 'total_seconds': total, 'max_seconds': longest}
+                           for stage, (calls, total, longest) in sorted(self.timers.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+metrics = Metrics()
@@ -0,0 +1,95 @@
+"""
+Range min/max queries over OHLC series.
+
+A RangeTable is a sparse table: level k holds the min (or max) of every run
+of 2**k values, so the extremum of any [a, b) range is the extremum of two
+overlapping runs, an O(1) lookup that also works on arrays of ranges at once.
+It is built once per series in O(n log n) and appending candles only fills
+in the entries that cover them (O(log n) per candle).
+
+OHLCRanges pairs the lowest Low and highest High tables of one OHLC series,
+so the indicators computed on the same candles can share it.
+
+    ranges = OHLCRanges(data)
+    ranges.low(a, b)  # data['Low'].iloc[a:b].min()
+    ranges.high(starts, ends)  # one value per range
+"""
+import numpy as np
+
+class RangeTable:
+    """
+    Extremum of any [a, b) range of a series, `func` is the ufunc combining
+    two values: np.fmin / np.fmax ignore NaN (like Series.min / max),
+    np.minimum / np.maximum propagate it.
+    """
+    def __init__(self, values=(), func=np.fmax):
+        self.func = func
+        self.n = 0
+        self.table = np.empty((1, 0))  # table[k, j] = func over values[j:j + 2**k]
+        self.append(values)
+
+    def __len__(self):
+        return self.n
+
+    def _reserve(self, n):
+        levels, capacity = self.table.shape
+        if n.bit_length() > levels or n > capacity:
+            # Grown geometrically so appending one candle at a time stays cheap
+            table = np.empty((max(n.bit_length(), levels), max(n, 2 * capacity)))
+            table[:levels, :capacity] = self.table
+            self.table = table
+
+    def append(self, values):
+        """ Add values at the end of the series. """
+        values = np.asarray(values, dtype=float).ravel()
+        if not values.shape[0]:
+            return
+        n = self.n + values.shape[0]
+        self._reserve(n)
+        self.table[0, self.n:n] = values
+        for k in range(1, n.bit_length()):
+            half = 1 << (k - 1)
+            # Runs of 2**k values covering at least one new value
+            start, end = max(self.n - 2 * half + 1, 0), n - 2 * half + 1
+            self.func(self.table[k-1, start:end], self.table[k-1, start+half:end+half],
+                      out=self.table[k, start:end])
+        self.n = n
+
+    def query(self, a, b):
+        """
+        Extremum of values[a:b], a and b may be arrays of ranges
+        (0 <= a, b <= len). Empty ranges (b <= a) give NaN, like Series.min().
+        """
+        a, b = np.asarray(a), np.asarray(b)
+        if np.any(a < 0) or np.any(b > self.n):
+            raise IndexError(f"Range outside of the {self.n} values")
+        empty = b <= a
+        if empty.any():
+            if empty.all():
+                return np.full(empty.shape, np.nan)[()]
+            # Answered as ranges of the first value, then blanked
+            return np.where(empty, np.nan, self.query(np.where(empty, 0, a), np.where(empty, 1, b)))[()]
+        k = np.frexp(b - a)[1] - 1  # floor(log2(b - a))
+        return self.func(self.table[k, a], self.table[k, b - (1 << k)])
+
+class OHLCRanges:
+    """ Lowest Low and highest High over bar ranges of one OHLC series. """
+    def __init__(self, data=None, low=None, high=None, ignore_nan=True):
+        if data is not None:
+            low, high = data['Low'], data['High']
+        self.lows = RangeTable(() if low is None else low, np.fmin if ignore_nan else np.minimum)
+        self.highs = RangeTable(() if high is None else high, np.fmax if ignore_nan else np.maximum)
+
+    def __len__(self):
+        return len(self.lows)
+
+    def low(self, a, b):
+        return self.lows.query(a, b)
+
+    def high(self, a, b):
+        return self.highs.query(a, b)
+
+    def append(self, low, high):
+        """ Add candles (their Lows and Highs) at the end of the series. """
+        self.lows.append(low)
+        self.highs.append(high)
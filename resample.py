@@ -0,0 +1,56 @@
+"""
+Build higher timeframe klines locally from a base interval.
+
+Groups are aligned to the exchange kline boundaries: open times are multiples
+of the interval length since the epoch, except weekly klines which open on
+Monday 00:00 UTC.
+"""
+import time
+import numpy as np
+import pandas as pd
+from binance import INTERVAL_MS
+
+WEEK_OFFSET_MS = 4 * 86_400_000  # The epoch is a Thursday, weekly klines open on Monday
+
+def interval_start(times, interval):
+    """ Open time (ms) of the `interval` kline containing each time (ms). """
+    ms = INTERVAL_MS[interval]
+    offset = WEEK_OFFSET_MS if interval == '1w' else 0
+    return (times - offset) // ms * ms + offset
+
+def resample_klines(data, interval, partial=True):
+    """
+    Aggregate an OHLCV DataFrame into `interval` klines.
+
+    args:
+        data: OHLCV DataFrame indexed by open time, at a lower interval
+        interval: target interval, e.g. '4h' or '1d'
+        partial: keep the last kline if it is still being built (as the exchange
+            returns the current kline). The first kline is always dropped when the
+            history starts in the middle of it.
+    """
+    times = data.index.as_unit('ms').asi8
+    if times.shape[0] == 0:
+        return data.iloc[:0]
+    keys = interval_start(times, interval)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+    resampled = pd.DataFrame({
+        'Open': data['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(data['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(data['Low'].to_numpy(), starts),
+        'Close': data['Close'].to_numpy()[np.r_[starts[1:] - 1, times.shape[0] - 1]],
+        'Volume': np.add.reduceat(data['Volume'].to_numpy(), starts),
+    }, index=pd.to_datetime(keys[starts], unit='ms'))
+    resampled.index.name = data.index.name
+
+    # History starting mid-kline would give a wrong Open/High/Low for it
+    if times[0] != keys[0]:
+        resampled = resampled.iloc[1:]
+    if not partial and len(resampled):
+        # Still open, or the base history ends before the kline does
+        end = keys[-1] + INTERVAL_MS[interval]
+        base_ms = np.diff(times).min() if times.shape[0] > 1 else 0
+        if end > time.time() * 1000 or times[-1] + base_ms < end:
+            resampled = resampled.iloc[:-1]
+    return resampled
@@ -1,3 +1,3 @@
 conda activate trader
 cd ~/Desktop/code/EpiclyTrading
-python scan.py
\ No newline at end of file
+python scan.py --schedule
\ No newline at end of file
@@ -1,10 +1,24 @@
 # Import required libraries and your indicators
 import logging
 import requests
-import pandas as pd
+import numpy as np
 from datetime import datetime
 import os  # Import os module to handle directory operations
-from indicators import relativeCandlesReversalPatterns, Cycles, relativeCandlesPhases
+import argparse
+import cProfile
+import time
+from metrics import metrics
+from binance import BinanceClient, fetch_concurrently, DEFAULT_WORKERS, INTERVAL_MS
+from store import CandleStore, STORE_DIR, DEFAULT_LIMIT
+from resample import resample_klines, interval_start
+from panel import stackFrames, evaluatePanel
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from evaluation import packBatch, evaluateBatch, DEFAULT_BATCH
+from criteria import Plan
+from artifacts import write_artifact, read_artifact
+from history import SignalHistory
+from universe import universe, EXCHANGE_INFO_TTL, MIN_QUOTE_VOLUME, MIN_TRADES
 
 # Set up logging
 logging.basicConfig(
@@ -15,15 +29,16 @@ logging.basicConfig(
 
 logging.info("Script started")
 
-# Fetch list of futures tickers from Binance API
-def fetch_futures_tickers():
-    url = "https://api.binance.com/api/v1/exchangeInfo"
+# Watchlist criteria, their indicators and the klines they need
+plan = Plan()
+
+# Fetch list of futures tickers from Binance API (cached exchangeInfo next to
+# the candle store, prefiltered by 24h activity)
+def fetch_futures_tickers(store, ttl=EXCHANGE_INFO_TTL, min_quote_volume=MIN_QUOTE_VOLUME, min_trades=MIN_TRADES):
     logging.info("Fetching list of futures tickers from Binance API...")
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        tickers = [item['symbol'] for item in data['symbols'] if item['quoteAsset'] == 'USDT']
+        tickers = universe(store.client, os.path.join(store.root, 'exchange_info.json'), ttl,
+                           min_quote_volume=min_quote_volume, min_trades=min_trades)
         logging.info(f"Fetched {len(tickers)} futures tickers.")
         return tickers
     except requests.exceptions.RequestException as e:
@@ -31,88 +46,419 @@ def fetch_futures_tickers():
         return []
 
 # Fetch historical data for each ticker based on timeframe
-def fetch_data(ticker, interval):
-    url = f"https://api.binance.com/api/v1/klines?symbol={ticker}&interval={interval}"
-    logging.info(f"Fetching {interval} data for {ticker}...")
+def fetch_data(store, ticker, interval, history=DEFAULT_LIMIT, limit=None, refresh=True):
+    logging.debug(f"Fetching {interval} data for {ticker}...")
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data, columns=['Time', 'Open', 'High', 'Low', 'Close', 'Volume', '_', '_', '_', '_', '_', '_'])
-        df['Time'] = pd.to_datetime(df['Time'], unit='ms')
-        df.set_index('Time', inplace=True)
-        logging.info(f"Fetched {interval} data for {ticker}.")
+        # Only klines newer than the stored ones are downloaded
+        with metrics.timer('kline_fetch'):
+            store.update(ticker, interval, history=history, refresh=refresh)
+        df = store.load(ticker, interval, limit=limit)
+        logging.debug(f"Fetched {interval} data for {ticker}.")
         return df
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching {interval} data for {ticker}: {e}")
         return None
-
-# Apply technical analysis to each ticker
-def apply_technical_analysis(data):
-    logging.info("Applying technical analysis...")
-    reversal_pattern = relativeCandlesReversalPatterns(data)
-    cycles = Cycles(data)
-    phases = relativeCandlesPhases(data)
-    logging.info(f"Reversal Pattern: {reversal_pattern}")
-    logging.info(f"Cycles: {cycles.iloc[-1]}")
-    logging.info(f"Phases: {phases[-1]}")
-    return reversal_pattern, cycles, phases
+    except Exception as e:
+        # Bad response or store file: skip this ticker, not the whole scan
+        metrics.count('fetch_errors')
+        logging.error(f"Error loading {interval} data for {ticker}: {e!r}")
+        return None
 
 # Add tickers to watchlist if they meet certain criteria
-def evaluate_ticker(ticker, data):
-    logging.info(f"Evaluating {ticker} for potential watchlist addition...")
-    reversal_pattern, cycles, phases = apply_technical_analysis(data)
-    
-    # Define criteria to add to the watchlist
-    if reversal_pattern == 1:  # Buy sequence
-        logging.info(f"{ticker} meets buy sequence criteria. Adding to watchlist.")
-        return True
-    elif reversal_pattern == -1:  # Sell sequence
-        logging.info(f"{ticker} meets sell sequence criteria. Adding to watchlist.")
+def evaluate_ticker(ticker, data, values=None):
+    logging.debug(f"Evaluating {ticker} for potential watchlist addition...")
+    # Only the indicators the criteria need are computed
+    return meets_criteria(ticker, plan.evaluate(data, values))
+
+def meets_criteria(ticker, criterion):
+    if criterion:
+        logging.info(f"{ticker} meets {criterion} criteria. Adding to watchlist.")
         return True
-    else:
-        logging.info(f"{ticker} does not meet any criteria. Skipping.")
-        return False
+    logging.debug(f"{ticker} does not meet any criteria. Skipping.")
+    return False
+
+# Signal history row of a listed ticker: (signal, cycle, close time of the candle)
+def signal_row(values, timeframe, open_time):
+    cycle = values.get('cycle')
+    signal = values.get('reversal_pattern')
+    return (None if signal is None else int(signal), None if cycle is None else str(cycle),
+            int(open_time) + INTERVAL_MS[timeframe] - 1)
+
+def last_open_time(frame):
+    return int(frame.index.as_unit('ms').asi8[-1])
+
+# Klines of a timeframe closed by `now` (ms), as live.py keeps when seeding
+def closed_klines(frame, timeframe, now):
+    return frame[frame.index.as_unit('ms').asi8 + INTERVAL_MS[timeframe] <= now]
+
+# Timeframes to analyze
+TIMEFRAMES = ['1h', '4h', '1d'] # , '1w','15m', '30m']
+SETTLE_SECONDS = 5  # Wait after a candle close so the exchange has the new kline
+
+# Evaluate all tickers of one timeframe at once
+def evaluate_panel(frames, timeframe):
+    logging.info(f"Evaluating {len(frames)} tickers in panel mode...")
+    with metrics.timer('indicator.panel'):
+        results = evaluatePanel(*stackFrames(frames.values()))
+    # Same criteria as evaluate_ticker, on the panel values
+    listed = {}
+    for (ticker, frame), result in zip(frames.items(), results):
+        values = {'reversal_pattern': int(result['signal']), 'phase': float(result['phase'])}
+        if evaluate_ticker(ticker, frame, values):
+            listed[ticker] = signal_row(values, timeframe, last_open_time(frame))
+    return listed
+
+# Candles of a watchlisted ticker for its artifact. The criteria may have
+# needed only a few klines, the store is topped up to a chart's worth.
+def artifact_data(store, ticker, timeframe, base=None):
+    interval, history = timeframe, DEFAULT_LIMIT
+    if base and base != timeframe:
+        interval, history = base, (DEFAULT_LIMIT + 1) * INTERVAL_MS[timeframe] // INTERVAL_MS[base]
+    try:
+        try:
+            store.update(ticker, interval, history=history, refresh=False)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error fetching {interval} data for {ticker}: {e}")
+        data = store.load(ticker, interval, limit=history)
+        return resample_klines(data, timeframe) if interval != timeframe else data
+    except Exception as e:
+        metrics.count('fetch_errors')
+        logging.error(f"Error loading {interval} data for {ticker}: {e!r}")
+        return None
+
+# Last stage of a scan: every ticker's outcome on a timeframe is put here as
+# soon as it is decided. Listed tickers are appended to the watchlist file at
+# once; when every ticker of a timeframe is decided, its watchlist is recorded
+# in `signal_history` and rewritten in exchange order. Artifacts are saved
+# from `store` on close(), once the fetch stage no longer uses the connection
+# pool, and give the cycle state of listed tickers the criteria did not need.
+class WatchlistSink:
+    def __init__(self, tickers, timeframes, directory, signal_history, store, base=None,
+                 workers=DEFAULT_WORKERS, members=None):
+        self.signal_history, self.store = signal_history, store
+        self.order = {ticker: i for i, ticker in enumerate(tickers)}
+        self.remaining = {timeframe: len(tickers) for timeframe in timeframes}
+        self.rows = {timeframe: {} for timeframe in timeframes}
+        self.base, self.workers, self.members = base, workers, members
+        # Generate filenames with date, hour, and timeframe
+        now = datetime.now()
+        self.time = now.timestamp() * 1000
+        timestamp = now.strftime("%Y%m%d_%H%M")
+        self.filenames = {timeframe: os.path.join(directory, f'watchlist_{timeframe}_{timestamp}.txt')
+                          for timeframe in timeframes}
+        self.files = {timeframe: open(filename, 'w') for timeframe, filename in self.filenames.items()}
+        self.finished = {}  # timeframe -> (watchlist, its rows, run) waiting for the artifact
+
+    def put(self, ticker, timeframe, row=None):
+        """ Outcome of a ticker on a timeframe: its signal_row when listed, None otherwise. """
+        if row is not None:
+            self.rows[timeframe][ticker] = row
+            self.files[timeframe].write(f"{ticker}\n")
+            self.files[timeframe].flush()
+        self.remaining[timeframe] -= 1
+        if self.remaining[timeframe] == 0:
+            self.finish(timeframe)
+
+    def finish(self, timeframe):
+        if self.files.get(timeframe) is None:
+            return
+        self.files.pop(timeframe).close()
+        rows, filename = self.rows.pop(timeframe), self.filenames[timeframe]
+        if self.members is not None:
+            for key in [key for key in self.members if key[1] == timeframe]:
+                del self.members[key]
+            self.members.update({(ticker, timeframe): row for ticker, row in rows.items()})
+
+        # Keep exchange order so output does not depend on arrival order
+        watchlist = sorted(rows, key=self.order.get)
+
+        # Record the watchlist and export it to its text file
+        with metrics.timer('watchlist_write'):
+            logging.info(f"Writing watchlist for {timeframe} to file: {filename}...")
+            run = self.signal_history.record(timeframe, [(ticker, *rows[ticker]) for ticker in watchlist],
+                                             self.time)
+            self.signal_history.export_watchlist(run, filename)
+
+        logging.info(f"Watchlist for {timeframe} saved with {len(watchlist)} tickers.")
+        self.finished[timeframe] = (watchlist, rows, run)
+
+    def close(self):
+        """ Finish the timeframes still open and save the artifacts. """
+        for timeframe in list(self.files):
+            self.finish(timeframe)
+        for timeframe, (watchlist, rows, run) in self.finished.items():
+            # Candles and indicators of the listed tickers for view.py
+            with metrics.timer('artifact_write'):
+                jobs = [(ticker, timeframe, self.base) for ticker in watchlist]
+                fetch = lambda ticker, timeframe, base: artifact_data(self.store, ticker, timeframe, base)
+                frames = {job[0]: data for job, data in fetch_concurrently(fetch, jobs, max_workers=self.workers)}
+                write_artifact(self.filenames[timeframe], timeframe,
+                               {ticker: frames[ticker] for ticker in watchlist
+                                if frames[ticker] is not None and not frames[ticker].empty})
+            self.record_cycles(timeframe, rows, run)
+        self.finished = {}
+
+    def record_cycles(self, timeframe, rows, run):
+        """ Cycle states missing from the rows of a run, from the artifact row of the listed candle. """
+        artifact = read_artifact(self.filenames[timeframe])
+        if artifact is None:
+            return
+        array, index = artifact
+        cycles = {}
+        for ticker, (start, end) in index['tickers'].items():
+            signal, cycle, close_time = rows[ticker]
+            found = np.flatnonzero(array['close_time'][start:end] == close_time)
+            if cycle is None and found.size:
+                cycles[ticker] = index['cycles'][array['cycle'][start + found[-1]]]
+                if self.members is not None:
+                    self.members[(ticker, timeframe)] = (signal, cycles[ticker], close_time)
+        self.signal_history.set_cycles(run, cycles)
+
+    def abort(self):
+        """ Stop without recording, the files keep the tickers listed so far. """
+        for f in self.files.values():
+            f.close()
+        self.files = {}
 
 # Main script execution
-def main():
-    watchlists = {}
-    tickers = fetch_futures_tickers()
-    
-    # Define the timeframes to analyze
-    timeframes = ['1h', '4h', '1d'] # , '1w','15m', '30m']
+def main(store, signal_history, workers=DEFAULT_WORKERS, resample=False, panel=False, processes=0,
+         batch_size=DEFAULT_BATCH, timeframes=TIMEFRAMES, state=None, filters=None):
+    """
+    Scan every ticker on `timeframes` and write their watchlists.
+
+    Klines come from the CandleStore `store` (topped up through its client)
+    and watchlists are recorded in the SignalHistory `signal_history`.
+
+    The scan is a pipeline: tickers -> fetch and decode (fetch_concurrently,
+    at most 2 * workers in flight) -> evaluate (inline or on a process pool
+    with at most 2 * processes batches pending) -> WatchlistSink. Each stage
+    only takes more work when the next one keeps up, so memory does not grow
+    with the number of tickers (except in panel mode, which needs them all).
+
+    `state` (a dict kept between scheduled runs) remembers the tickers and,
+    per ticker and timeframe, the last kline evaluated and whether it made
+    the watchlist: tickers without a new kline since are not evaluated again.
+    `filters` are keyword arguments of fetch_futures_tickers.
+    """
+    if state is None:
+        tickers = fetch_futures_tickers(store, **(filters or {}))
+        members = None
+    else:
+        # The ticker list is refreshed once a day
+        if not state.get('tickers') or '1d' in timeframes:
+            state['tickers'] = fetch_futures_tickers(store, **(filters or {}))
+        tickers = state['tickers']
+        stamps = state.setdefault('stamps', {})
+        members = state.setdefault('members', {})
+
+    panels = {timeframe: {} for timeframe in timeframes}
+
+    # Scheduled runs only download klines once the stored last one has closed
+    refresh = state is None
+
+    # Only as many klines as the criteria look back on (all stored ones when
+    # they depend on the whole history)
+    history, lookback = plan.history(DEFAULT_LIMIT), plan.lookback
+    if state is not None:
+        # Scheduled runs wake just after a close, when the next kline has
+        # already opened: it is dropped so the one that closed is evaluated
+        # (and stamped), one more kline is fetched in its place
+        now = time.time() * 1000
+        if lookback is not None:
+            history, lookback = history + 1, lookback + 1
+    base = None
+    if resample:
+        # Only fetch the base interval, with enough history to build the others
+        # (plus one kline as the first resampled one may be incomplete)
+        base = timeframes[0]
+        history = (history + 1) * max(INTERVAL_MS[tf] for tf in timeframes) // INTERVAL_MS[base]
+        limit = history if lookback is not None else None
+        fetch = lambda ticker, interval: fetch_data(store, ticker, interval, history=history, limit=limit,
+                                                    refresh=refresh)
+        jobs = ((ticker, base) for ticker in tickers)
+    else:
+        fetch = lambda ticker, interval: fetch_data(store, ticker, interval, history=history,
+                                                    limit=lookback, refresh=refresh)
+        jobs = ((ticker, timeframe) for timeframe in timeframes for ticker in tickers)
     
     # Create watchlists directory if it doesn't exist
     watchlists_dir = 'watchlists'
     os.makedirs(watchlists_dir, exist_ok=True)
+    sink = WatchlistSink(tickers, timeframes, watchlists_dir, signal_history, store, base, workers, members)
 
-    for timeframe in timeframes:
-        watchlist = []
-        logging.info(f"Analyzing tickers for {timeframe} timeframe...")
-        
-        for ticker in tickers:
-            try:
-                data = fetch_data(ticker, timeframe)
-                if data is not None:
-                    if evaluate_ticker(ticker, data):
-                        watchlist.append(ticker)
-            except:
+    # Indicators run on worker processes while this one keeps fetching
+    executor = ProcessPoolExecutor(max_workers=processes) if processes else None
+    batch, futures = [], deque()
+
+    def collect(future):
+        with metrics.timer('process_pool_wait'):
+            results = future.result()
+        for (ticker, timeframe, open_time), values in results:
+            if values is None:
+                metrics.count('evaluation_errors')
                 logging.error(f"Error analyzing {ticker} for {timeframe} timeframe.")
-        
-        # Generate filename with date, hour, and timeframe
-        now = datetime.now()
-        timestamp = now.strftime("%Y%m%d_%H%M")
-        filename = os.path.join(watchlists_dir, f'watchlist_{timeframe}_{timestamp}.txt')
-        
-        # Output watchlist to file
-        with open(filename, 'w') as f:
-            logging.info(f"Writing watchlist for {timeframe} to file: {filename}...")
-            for ticker in watchlist:
-                f.write(f"{ticker}\n")
-        
-        logging.info(f"Watchlist for {timeframe} saved with {len(watchlist)} tickers.")
+                sink.put(ticker, timeframe)
+            elif evaluate_ticker(ticker, None, values):
+                sink.put(ticker, timeframe, signal_row(values, timeframe, open_time))
+            else:
+                sink.put(ticker, timeframe)
+
+    def submit(batch):
+        futures.append(executor.submit(evaluateBatch, *packBatch(batch), plan.indicators))
+        # Back-pressure: wait for the oldest batch before fetching more
+        while len(futures) > 2 * processes:
+            collect(futures.popleft())
+
+    # Fetch every ticker/timeframe concurrently and evaluate them as they arrive
+    logging.info(f"Analyzing {len(tickers)} tickers for {timeframes} timeframes with {workers} workers, "
+                 f"indicators {plan.indicators} on {history} klines...")
+    try:
+        for (ticker, interval), data in fetch_concurrently(fetch, jobs, max_workers=workers):
+            if data is None or data.empty:
+                for timeframe in (timeframes if resample else [interval]):
+                    sink.put(ticker, timeframe)
+                continue
+            if resample:
+                try:
+                    frames = {timeframe: resample_klines(data, timeframe) if timeframe != interval else data
+                              for timeframe in timeframes}
+                except Exception as e:
+                    metrics.count('fetch_errors')
+                    logging.error(f"Error resampling {interval} data for {ticker}: {e!r}")
+                    for timeframe in timeframes:
+                        sink.put(ticker, timeframe)
+                    continue
+            else:
+                frames = {interval: data}
+            for timeframe, frame in frames.items():
+                if state is not None:
+                    frame = closed_klines(frame, timeframe, now)
+                    if frame.empty:
+                        sink.put(ticker, timeframe)
+                        continue
+                    key, stamp = (ticker, timeframe), frame.index[-1]
+                    if stamps.get(key) == stamp:
+                        # No new kline since the last evaluation
+                        metrics.count('skipped')
+                        sink.put(ticker, timeframe, members.get(key))
+                        continue
+                    stamps[key] = stamp
+                if panel:
+                    panels[timeframe][ticker] = frame
+                    continue
+                if executor:
+                    batch.append(((ticker, timeframe, last_open_time(frame)), frame))
+                    if len(batch) >= batch_size:
+                        submit(batch)
+                        batch = []
+                    continue
+                row = None
+                try:
+                    values = {}
+                    if evaluate_ticker(ticker, frame, values):
+                        row = signal_row(values, timeframe, last_open_time(frame))
+                except:
+                    metrics.count('evaluation_errors')
+                    logging.error(f"Error analyzing {ticker} for {timeframe} timeframe.")
+                sink.put(ticker, timeframe, row)
+
+        if panel:
+            for timeframe in timeframes:
+                frames = panels.pop(timeframe)
+                listed = evaluate_panel(frames, timeframe) if frames else {}
+                for ticker in frames:
+                    sink.put(ticker, timeframe, listed.get(ticker))
+
+        if executor:
+            if batch:
+                submit(batch)
+            while futures:
+                collect(futures.popleft())
+    except BaseException:
+        sink.abort()
+        raise
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    sink.close()
+
+def next_close(timeframes, now):
+    """ Time (s) of the next kline close of any timeframe, and the timeframes closing then. """
+    ms = int(now * 1000)
+    closes = {timeframe: int(interval_start(ms, timeframe)) + INTERVAL_MS[timeframe] for timeframe in timeframes}
+    close = min(closes.values())
+    return close / 1000, [timeframe for timeframe in timeframes if closes[timeframe] == close]
+
+def run(metrics_dir, **args):
+    """ One scan, with its metrics written to `metrics_dir`. """
+    metrics.reset()
+    with metrics.timer('run'):
+        main(**args)
+    metrics_file = os.path.join(metrics_dir, f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    metrics.write(metrics_file)
+    logging.info(f"Metrics written to {metrics_file}")
+
+def schedule(metrics_dir, settle=SETTLE_SECONDS, **args):
+    """ Scan every timeframe now, then each timeframe again whenever its candle closes. """
+    state = {}
+    run(metrics_dir, timeframes=TIMEFRAMES, state=state, **args)
+    while True:
+        close, timeframes = next_close(TIMEFRAMES, time.time())
+        logging.info(f"Next scan of {timeframes} at {datetime.fromtimestamp(close + settle)}.")
+        time.sleep(max(close + settle - time.time(), 0))
+        run(metrics_dir, timeframes=timeframes, state=state, **args)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scan Binance USDT tickers for reversal patterns.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent kline requests")
+    parser.add_argument('--base-url', default=None, help="API base URL (e.g. a local stand-in server)")
+    parser.add_argument('--store', default=STORE_DIR, help="Local candle store directory")
+    parser.add_argument('--resample', action='store_true',
+                        help="Fetch only the lowest timeframe and build the others locally")
+    parser.add_argument('--panel', action='store_true',
+                        help="Evaluate all tickers of a timeframe in one vectorized pass")
+    parser.add_argument('--processes', type=int, default=0,
+                        help="Evaluate indicators on this many worker processes (0: in the main process)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH, help="Tickers per worker task")
+    parser.add_argument('--metrics-dir', default='metrics', help="Where to write the per-run metrics JSON")
+    parser.add_argument('--profile', default=None, metavar='FILE', help="Profile the run with cProfile into FILE")
+    parser.add_argument('--exchange-info-ttl', type=float, default=EXCHANGE_INFO_TTL,
+                        help="Seconds the cached exchangeInfo is reused")
+    parser.add_argument('--min-quote-volume', type=float, default=MIN_QUOTE_VOLUME,
+                        help="Skip symbols with less 24h quote volume")
+    parser.add_argument('--min-trades', type=int, default=MIN_TRADES, help="Skip symbols with fewer 24h trades")
+    parser.add_argument('--verbose', action='store_true', help="Log every ticker")
+    parser.add_argument('--schedule', action='store_true',
+                        help="Keep running, rescanning each timeframe when its candle closes")
+    args = parser.parse_args()
+    if args.base_url:
+        client = BinanceClient(base_url=args.base_url, pool_size=args.workers)
+    else:
+        client = BinanceClient(pool_size=args.workers)
+    store = CandleStore(client, root=args.store)
+    # Every watchlist is recorded here, the text files are exported from it
+    signal_history = SignalHistory()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    options = dict(store=store, signal_history=signal_history,
+                   workers=args.workers, resample=args.resample, panel=args.panel,
+                   processes=args.processes, batch_size=args.batch_size,
+                   filters=dict(ttl=args.exchange_info_ttl, min_quote_volume=args.min_quote_volume,
+                                min_trades=args.min_trades))
+    try:
+        if args.schedule:
+            schedule(args.metrics_dir, **options)
+        else:
+            run(args.metrics_dir, **options)
+    except KeyboardInterrupt:
+        logging.info("Interrupted.")
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        logging.info(f"Profile written to {args.profile}")
 
 logging.info("Script finished.")
@@ -0,0 +1,115 @@
+"""
+Local OHLCV candle store.
+
+Klines are kept on disk per (symbol, interval) as a flat binary file of
+fixed size records (see RECORD) that can be memory-mapped and appended to.
+update() only asks the exchange for klines from the last stored one onwards,
+so repeat runs download a handful of candles instead of the full window, and
+histories grow past what a single request allows.
+"""
+import logging
+import os
+import time
+import numpy as np
+from binance import INTERVAL_MS
+from klines import RECORD, decode_klines, records_to_frame
+from metrics import metrics
+
+STORE_DIR = 'candles'
+DEFAULT_LIMIT = 500  # Klines fetched for a symbol the store has never seen
+MAX_LIMIT = 1000  # Most klines the exchange returns per request
+
+def klines_weight(limit):
+    """ Request weight of /klines, which grows with the limit. """
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    return 5 if limit <= MAX_LIMIT else 10
+
+class CandleStore:
+    """ On-disk candles keyed by (symbol, interval), topped up from the exchange. """
+    def __init__(self, client, root=STORE_DIR):
+        self.client = client
+        self.root = root
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, interval, f"{symbol}.bin")
+
+    def read(self, symbol, interval):
+        """ Memory-mapped RECORD array of stored candles (empty if none). """
+        path = self.path(symbol, interval)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty(0, dtype=RECORD)
+        return np.memmap(path, dtype=RECORD, mode='r')
+
+    def load(self, symbol, interval, limit=None, dtype=np.float64):
+        """ Stored candles as a DataFrame, only the last `limit` if given, prices as `dtype`. """
+        records = self.read(symbol, interval)
+        if limit is not None:
+            records = records[-limit:]
+        with metrics.timer('dataframe_build'):
+            return records_to_frame(records, dtype)
+
+    def append(self, symbol, interval, records):
+        """ Append candles, replacing stored ones from the first new open time on. """
+        if not len(records):
+            return
+        path = self.path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stored = self.read(symbol, interval)
+        keep = int(np.searchsorted(stored['time'], records['time'][0]))
+        del stored
+        if os.path.exists(path):
+            os.truncate(path, keep * RECORD.itemsize)
+        with open(path, 'ab') as f:
+            records.tofile(f)
+
+    def update(self, symbol, interval, history=DEFAULT_LIMIT, refresh=True):
+        """
+        Fetch klines newer than the stored ones and append them.
+
+        The last stored kline is requested again since it may still have been
+        open when it was fetched. With refresh=False nothing is fetched while
+        that kline is still the current one. A store holding fewer than
+        `history` klines fetches the whole history window again.
+
+        Returns the number of klines received.
+        """
+        stored = self.read(symbol, interval)
+        params = {'symbol': symbol, 'interval': interval}
+        if len(stored) >= history or (len(stored) and interval not in INTERVAL_MS):
+            if not refresh and stored['close_time'][-1] >= time.time() * 1000:
+                return 0
+            params['startTime'] = int(stored['time'][-1])
+            if interval in INTERVAL_MS:
+                # Just the klines opened since the last stored one
+                missing = (int(time.time() * 1000) - params['startTime']) // INTERVAL_MS[interval] + 1
+                params['limit'] = int(np.clip(missing, 1, MAX_LIMIT))
+            else:
+                params['limit'] = MAX_LIMIT
+        elif interval in INTERVAL_MS and (history > MAX_LIMIT or len(stored)):
+            # Page forward from the start of the history, this also backfills
+            # a store holding fewer klines than asked for
+            ms = INTERVAL_MS[interval]
+            params['startTime'] = int(time.time() * 1000) // ms * ms - (history - 1) * ms
+            params['limit'] = min(history, MAX_LIMIT)
+        else:
+            params['limit'] = min(history, MAX_LIMIT)
+        del stored
+
+        received = 0
+        while True:
+            response = self.client.get("/api/v1/klines", params=params, weight=klines_weight(params['limit']))
+            with metrics.timer('kline_decode'):
+                records = decode_klines(response.content)
+            with metrics.timer('store_write'):
+                self.append(symbol, interval, records)
+            received += len(records)
+            # Page forward when more klines are missing than one request returns
+            if ('startTime' not in params or len(records) < params['limit']
+                    or records['close_time'][-1] >= time.time() * 1000):
+                break
+            params['startTime'] = int(records['time'][-1]) + 1
+        logging.debug(f"Stored {received} {interval} klines for {symbol}.")
+        return received
@@ -0,0 +1,218 @@
+"""
+Streaming versions of the indicators in indicators.py.
+
+Each tracker is fed one closed candle at a time with update(candle) and returns
+the indicator value for that candle without recomputing the history. A candle
+is anything indexable by 'Open', 'High', 'Low' and 'Close' (a DataFrame row,
+a dict...).
+
+Trackers can be snapshotted with to_dict() (JSON serializable) and restored
+with from_dict() between runs.
+"""
+import abc
+from collections import deque
+import numpy as np
+from indicators import (
+    CANDLE_TAGS, TAG_X, TAG_TRANSITIONS, PHASE_TABLE, CYCLE_STATES, CYCLE_X,
+    BAR_UP, BAR_DOWN, BAR_INSIDE, BAR_INSIDE2,
+    BAR_OUTSIDE_GREEN, BAR_OUTSIDE_RED, BAR_OUTSIDE_DOJI, BAR_NONE,
+    cycleTransition, linregLast, _fmin, _fmax,
+)
+
+TRANSITIONS = TAG_TRANSITIONS.tolist()
+
+class Tracker(abc.ABC):
+    """
+    Base class for streaming indicators.
+
+    Subclasses list their plain state attributes in `fields` (deques among them
+    also in `deques`, they are saved as lists) and the nested trackers they
+    feed in `children` (attribute name -> tracker class).
+    """
+    fields = ()
+    deques = ()
+    children = {}
+
+    @abc.abstractmethod
+    def update(self, candle):
+        """ Add the next closed candle, returns the indicator value for it. """
+
+    def replay(self, data):
+        """ Feed every candle of an OHLC DataFrame, returns the list of values. """
+        candles = data[['Open', 'High', 'Low', 'Close']].to_dict('records')
+        return [self.update(candle) for candle in candles]
+
+    def to_dict(self):
+        state = {name: getattr(self, name) for name in self.fields}
+        for name in self.deques:
+            state[name] = [list(item) if isinstance(item, tuple) else item for item in state[name]]
+        for name in self.children:
+            state[name] = getattr(self, name).to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        tracker = cls.__new__(cls)
+        for name in cls.fields:
+            setattr(tracker, name, deque(state[name]) if name in cls.deques else state[name])
+        for name, child_cls in cls.children.items():
+            setattr(tracker, name, child_cls.from_dict(state[name]))
+        return tracker
+
+class CandleTagger(Tracker):
+    """ Streaming relativePositionOfCandles. update() returns the tag of the new candle. """
+    fields = ('count', 'high', 'low', 'inside', 'tag')
+
+    def __init__(self):
+        self.count = 0
+        self.high = np.nan
+        self.low = np.nan
+        self.inside = False  # Previous candle was inside its predecessor
+        self.tag = TAG_X
+
+    def update(self, candle):
+        high, low = float(candle['High']), float(candle['Low'])
+        hh, lh = high > self.high, self.high > high
+        hl, ll = low > self.low, self.low > low
+        inside = lh and hl
+
+        if hh and hl:
+            bar = BAR_UP
+        elif lh and ll:
+            bar = BAR_DOWN
+        elif inside:
+            bar = BAR_INSIDE2 if self.inside else BAR_INSIDE
+        elif hh and ll:
+            close, open_ = float(candle['Close']), float(candle['Open'])
+            if close > open_:
+                bar = BAR_OUTSIDE_GREEN
+            elif close < open_:
+                bar = BAR_OUTSIDE_RED
+            else:
+                bar = BAR_OUTSIDE_DOJI
+        else:
+            bar = BAR_NONE
+
+        # First two candles are always undefined
+        if self.count >= 2:
+            self.tag = TRANSITIONS[self.tag][bar]
+        self.count += 1
+        self.high, self.low, self.inside = high, low, inside
+        return CANDLE_TAGS[self.tag]
+
+class PhaseTracker(Tracker):
+    """ Streaming relativeCandlesPhases. update() returns the phase of the new candle. """
+    fields = ('count', 'tags', 'phase')
+    children = {'tagger': CandleTagger}
+
+    def __init__(self):
+        self.tagger = CandleTagger()
+        self.count = 0
+        self.tags = []  # Last three tag codes
+        self.phase = 0
+
+    def update(self, candle):
+        self.tagger.update(candle)
+        self.tags = self.tags[-2:] + [self.tagger.tag]
+
+        if self.count == 0:
+            self.phase = 1 if float(candle['Close']) > float(candle['Open']) else -1
+        elif self.count >= 3:
+            phase = int(PHASE_TABLE[self.tags[0], self.tags[1], self.tags[2]])
+            if phase:
+                self.phase = phase
+        self.count += 1
+        return float(self.phase)
+
+class CycleTracker(Tracker):
+    """ Streaming Cycles. update() returns the cycle state of the new candle. """
+    fields = ('count', 'state', 'phases', 'prefix', 'prev_prefix', 'prev', 'boundaries')
+    children = {'phase_tracker': PhaseTracker}
+
+    def __init__(self):
+        self.phase_tracker = PhaseTracker()
+        self.count = 0
+        self.state = CYCLE_X
+        self.phases = []  # Phases of the last two candles
+        self.prefix = [np.nan, np.nan]  # Lowest Low / highest High up to the previous candle
+        self.prev_prefix = [np.nan, np.nan]  # Same, one candle earlier
+        self.prev = [np.nan, np.nan]  # Low / High of the previous candle
+        # Last two phase boundaries: [low before, high before, low since, high since]
+        self.boundaries = []
+
+    def update(self, candle):
+        phase = int(self.phase_tracker.update(candle))
+        low, high = float(candle['Low']), float(candle['High'])
+
+        if self.count >= 3 and self.phases[-1] != self.phases[-2]:
+            self.boundaries = self.boundaries[-1:] + [self.prev_prefix + self.prev]
+        for boundary in self.boundaries:
+            boundary[2] = _fmin(boundary[2], low)
+            boundary[3] = _fmax(boundary[3], high)
+        prefix = [_fmin(self.prefix[0], low), _fmax(self.prefix[1], high)]
+
+        if self.boundaries:
+            last, first = self.boundaries[-1], self.boundaries[0]
+        else:
+            last, first = (np.nan, np.nan, prefix[0], prefix[1]), None
+        self.state = cycleTransition(self.state, phase, last, first)
+
+        self.count += 1
+        self.phases = self.phases[-1:] + [phase]
+        self.prev_prefix, self.prefix = self.prefix, prefix
+        self.prev = [low, high]
+        return CYCLE_STATES[self.state]
+
+class SqueezeTracker(Tracker):
+    """
+    Streaming squeeze. update() returns the squeeze value of the new candle.
+
+    The window's highest High and lowest Low are the heads of monotonic deques
+    and the Close sum is kept running, so a candle costs O(1) amortized plus
+    the regression over the last `period` inputs.
+    """
+    fields = ('period', 'count', 'maxima', 'minima', 'closes', 'close_sum', 'inputs')
+    deques = ('maxima', 'minima', 'closes', 'inputs')
+
+    def __init__(self, period=20):
+        self.period = period
+        self.count = 0
+        # (candle number, High) decreasing / (candle number, Low) increasing
+        self.maxima = deque()
+        self.minima = deque()
+        self.closes = deque()  # Last `period` Closes
+        self.close_sum = 0.0
+        self.inputs = deque()  # Last `period` regression inputs
+
+    def update(self, candle):
+        close, high, low = float(candle['Close']), float(candle['High']), float(candle['Low'])
+        n = self.count
+        self.count += 1
+        while self.maxima and self.maxima[-1][1] <= high:
+            self.maxima.pop()
+        self.maxima.append((n, high))
+        while self.minima and self.minima[-1][1] >= low:
+            self.minima.pop()
+        self.minima.append((n, low))
+        for extrema in (self.maxima, self.minima):
+            if extrema[0][0] <= n - self.period:
+                extrema.popleft()
+
+        self.closes.append(close)
+        self.close_sum += close
+        if len(self.closes) > self.period:
+            self.close_sum -= self.closes.popleft()
+        if n % self.period == 0:
+            # Summed again once per window so rounding errors do not build up
+            self.close_sum = sum(self.closes)
+        if len(self.closes) < self.period:
+            return 0.0
+
+        midline = (self.maxima[0][1] + self.minima[0][1]) / 2
+        sma = self.close_sum / self.period
+        self.inputs.append((midline + sma) / 2)
+        if len(self.inputs) > self.period:
+            self.inputs.popleft()
+        if len(self.inputs) < self.period:
+            return 0.0
+        return close - linregLast(np.array(self.inputs))
@@ -0,0 +1,58 @@
+"""
+Seeded synthetic OHLCV data for benchmarks and equivalence checks.
+
+The same (bars, regime, seed) always gives the same candles.
+"""
+import numpy as np
+import pandas as pd
+
+REGIMES = ('trending', 'ranging', 'gappy')
+
+def randomOHLC(bars, seed=0, price=100.0, volatility=0.01, decimals=None, freq='h', regime='random'):
+    """
+    Synthetic candles as an OHLCV DataFrame indexed by open time.
+
+    args:
+        bars: number of candles
+        seed: random seed
+        decimals: round prices (ties in Highs/Lows exercise equal-value paths)
+        regime: 'random' walk, 'trending' (drift with pullbacks), 'ranging'
+            (mean reverting) or 'gappy' (price jumps between candles and
+            missing candles in the time index)
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, volatility, bars)
+    if regime == 'trending':
+        # Drift that flips sign every few hundred candles
+        drift = np.sign(np.sin(np.arange(bars) / rng.uniform(50, 200)))
+        steps += drift * volatility / 3
+    elif regime == 'ranging':
+        # Ornstein-Uhlenbeck process around the start price
+        log_price = np.empty(bars)
+        level = 0.0
+        for i, step in enumerate(steps):
+            level += -0.05 * level + step
+            log_price[i] = level
+        steps = np.diff(log_price, prepend=0.0)
+    elif regime == 'gappy':
+        jumps = rng.random(bars) < 0.02
+        steps += jumps * rng.normal(0, volatility * 10, bars)
+
+    close = price * np.exp(np.cumsum(steps))
+    open_ = np.r_[price, close[:-1]] * np.exp(rng.normal(0, volatility / 4, bars))
+    wick = np.r_[price, close[:-1]] * volatility / 2
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, 1, bars)) * wick
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, 1, bars)) * wick
+    volume = rng.lognormal(10, 1, bars)
+    index = pd.date_range('2020-01-01', periods=bars, freq=freq, name='Time')
+    if regime == 'gappy':
+        # Exchange downtime: shift candles forward at random points
+        index = index + pd.to_timedelta(np.cumsum(rng.random(bars) < 0.005), unit=freq)
+    df = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+    if decimals is not None:
+        df = df.round(decimals)
+    return df
+
+def randomFrames(tickers, bars, seed=0, **args):
+    """ Dict of synthetic OHLCV DataFrames, one per ticker (SYN0USDT, SYN1USDT...). """
+    return {f"SYN{i}USDT": randomOHLC(bars, seed=seed + i, **args) for i in range(tickers)}
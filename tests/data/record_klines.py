@@ -0,0 +1,41 @@
+"""
+Record the kline fixtures of tests/test_resample.py from the exchange.
+
+    python tests/data/record_klines.py BTCUSDT 2024-03-01T05:00 2024-03-04T13:30
+
+Saves klines_<interval>.json (raw /klines rows) next to this file for 15m and
+1h from `start` to `end`, and the 4h / 1d klines opening in that range. Pick
+`start` off the 4h and 1d boundaries and `end` before the end of the last 4h
+and 1d klines, so the first resampled kline is dropped and the last is partial.
+"""
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from binance import BinanceClient, INTERVAL_MS  # noqa: E402
+
+def record(client, symbol, interval, start, end):
+    rows = []
+    while start < end:
+        page = client.get("/api/v1/klines", params={'symbol': symbol, 'interval': interval, 'startTime': start,
+                                                    'endTime': end - 1, 'limit': 1000}, weight=5).json()
+        if not page:
+            break
+        rows += page
+        start = page[-1][0] + INTERVAL_MS[interval]
+    return rows
+
+if __name__ == "__main__":
+    symbol, start, end = sys.argv[1:4]
+    start = int(datetime.fromisoformat(start).replace(tzinfo=timezone.utc).timestamp() * 1000)
+    end = int(datetime.fromisoformat(end).replace(tzinfo=timezone.utc).timestamp() * 1000)
+    client = BinanceClient()
+    for interval in ('15m', '1h', '4h', '1d'):
+        rows = record(client, symbol, interval, start, end)
+        # Klines opening before `start` are not covered by the base history
+        rows = [row for row in rows if row[0] >= start]
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f'klines_{interval}.json'), 'w') as f:
+            json.dump(rows, f, separators=(',', ':'))
+        print(interval, len(rows))
@@ -0,0 +1,92 @@
+"""
+Stand-in exchange for the scan and live tests.
+
+An Exchange holds synthetic klines and a clock (`now`, ms). serve() answers
+exchangeInfo, the 24h ticker and /klines over a local http.server the way the
+exchange does: klines up to the one open at `now`, which is only a stub of its
+candle (Open = High = Low = Close) since it opened a moment ago.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from binance import INTERVAL_MS
+from klines import RECORD
+
+def candleRecords(data, start, interval):
+    """ RECORD array of an OHLCV DataFrame, its first candle opening at `start` (ms). """
+    ms = INTERVAL_MS[interval]
+    records = np.empty(len(data), dtype=RECORD)
+    records['time'] = start + ms * np.arange(len(data))
+    for field in ('open', 'high', 'low', 'close', 'volume'):
+        records[field] = data[field.capitalize()].to_numpy(dtype=float)
+    records['close_time'] = records['time'] + ms - 1
+    return records
+
+def klineMessage(symbol, interval, record, closed=True):
+    """ Kline stream message of a RECORD row, in the exchange websocket format. """
+    return {'stream': f"{symbol.lower()}@kline_{interval}",
+            'data': {'e': 'kline', 's': symbol,
+                     'k': {'t': int(record['time']), 'T': int(record['close_time']), 'i': interval,
+                           'o': repr(float(record['open'])), 'h': repr(float(record['high'])),
+                           'l': repr(float(record['low'])), 'c': repr(float(record['close'])),
+                           'v': repr(float(record['volume'])), 'x': closed}}}
+
+class Exchange:
+    """ Klines of every (symbol, interval) as RECORD arrays, as seen at `now`. """
+    def __init__(self, klines, now):
+        self.klines = klines
+        self.now = now
+        self.symbols = list(dict.fromkeys(symbol for symbol, _ in klines))
+
+    def visible(self, symbol, interval):
+        """ Klines opened by now, the one still open as a stub. """
+        records = self.klines[(symbol, interval)]
+        records = records[records['time'] <= self.now].copy()
+        if len(records) and records['close_time'][-1] >= self.now:
+            for field in ('high', 'low', 'close'):
+                records[field][-1] = records['open'][-1]
+            records['volume'][-1] = 0
+        return records
+
+    def rows(self, symbol, interval, start=None, limit=500):
+        records = self.visible(symbol, interval)
+        records = records[records['time'] >= start][:limit] if start is not None else records[-limit:]
+        return [[int(r['time']), repr(float(r['open'])), repr(float(r['high'])), repr(float(r['low'])),
+                 repr(float(r['close'])), repr(float(r['volume'])), int(r['close_time']), '0', 10, '0', '0', '0']
+                for r in records]
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        exchange = self.server.exchange
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.endswith('/exchangeInfo'):
+            body = {'symbols': [{'symbol': symbol, 'quoteAsset': 'USDT', 'status': 'TRADING'}
+                                for symbol in exchange.symbols]}
+        elif url.path.endswith('/ticker/24hr'):
+            body = [{'symbol': symbol, 'quoteVolume': '1e9', 'count': 100_000} for symbol in exchange.symbols]
+        elif url.path.endswith('/klines'):
+            start = int(query['startTime']) if 'startTime' in query else None
+            body = exchange.rows(query['symbol'], query['interval'], start, int(query.get('limit', 500)))
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def serve(exchange):
+    """ Serve `exchange` on a local port from a thread, returns the server (see base_url). """
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.exchange = exchange
+    httpd.base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
@@ -0,0 +1,84 @@
+"""
+BinanceClient backoff and throttling against a local http.server stand-in.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from binance import BinanceClient, RateLimiter, WEIGHT_HEADER
+
+class StandIn(BaseHTTPRequestHandler):
+    """ Answers each GET with the next scripted (status, headers), then 200. """
+    script = []
+    times = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.times.append(time.time())
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        body = json.dumps({'ok': status == 200}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def server():
+    StandIn.script, StandIn.times = [], []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.mark.parametrize('status', [429, 418])
+def test_backoff_waits_retry_after(server, status):
+    StandIn.script = [(status, {'Retry-After': '1'})]
+    client = BinanceClient(base_url=server, limiter=RateLimiter())
+    response = client.get('/api/v1/ping')
+    assert response.json() == {'ok': True}
+    assert len(StandIn.times) == 2
+    assert StandIn.times[1] - StandIn.times[0] >= 0.9
+
+def test_backoff_pauses_other_requests(server):
+    StandIn.script = [(429, {'Retry-After': '1'})]
+    limiter = RateLimiter()
+    client = BinanceClient(base_url=server, limiter=limiter)
+    client.get('/api/v1/ping')
+    # A request issued during the backoff waits for it as well
+    limiter.blocked_until = time.time() + 1
+    t0 = time.time()
+    client.get('/api/v1/ping')
+    assert time.time() - t0 >= 0.9
+
+def test_gives_up_after_max_retries(server):
+    StandIn.script = [(429, {'Retry-After': '0'})] * 3
+    client = BinanceClient(base_url=server, limiter=RateLimiter(), max_retries=1)
+    with pytest.raises(Exception):
+        client.get('/api/v1/ping')
+    assert len(StandIn.times) == 2
+
+def test_used_weight_header_throttles(server):
+    # The exchange reports the whole (1s) window as used: the next request waits for the next window
+    StandIn.script = [(200, {WEIGHT_HEADER: '10'})]
+    client = BinanceClient(base_url=server, limiter=RateLimiter(weight_limit=10, window=1))
+    client.get('/api/v1/ping')
+    assert client.limiter.used == 10
+    client.get('/api/v1/ping')
+    first, second = StandIn.times
+    assert int(second) > int(first)
+
+def test_requests_under_the_limit_do_not_wait(server):
+    StandIn.script = [(200, {WEIGHT_HEADER: '1'})] * 5
+    client = BinanceClient(base_url=server, limiter=RateLimiter(weight_limit=1200))
+    t0 = time.time()
+    for _ in range(5):
+        client.get('/api/v1/ping')
+    assert time.time() - t0 < 0.9
@@ -0,0 +1,22 @@
+"""
+Worker evaluation computes the indicators it is asked for, as the criteria would.
+"""
+import pytest
+from criteria import INDICATORS
+from evaluation import analyze, evaluateBatch, packBatch
+from synthetic import randomFrames
+
+FRAMES = list(randomFrames(6, 300, decimals=2).items())
+
+@pytest.mark.parametrize('indicators', [tuple(INDICATORS), ('reversal_pattern',), ('phase', 'trend'), ()])
+def test_batch_computes_only_requested(indicators):
+    results = evaluateBatch(*packBatch(FRAMES), indicators)
+    assert [key for key, _ in results] == [key for key, _ in FRAMES]
+    for (_, values), (_, frame) in zip(results, FRAMES):
+        assert values == {name: INDICATORS[name][0](frame.reset_index(drop=True)) for name in indicators}
+
+def test_failed_ticker_gives_none():
+    frames = [('empty', FRAMES[0][1].iloc[:0]), FRAMES[1]]
+    (_, failed), (_, values) = evaluateBatch(*packBatch(frames), ('cycle',))
+    assert failed is None
+    assert values == analyze(FRAMES[1][1], ('cycle',))
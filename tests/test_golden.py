@@ -0,0 +1,17 @@
+"""
+Indicator outputs against benchmarks/golden.json (see benchmark.py --check).
+"""
+import json
+import os
+import benchmark
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), benchmark.GOLDEN_FILE)
+
+def test_golden_outputs_unchanged():
+    assert benchmark.checkGolden(GOLDEN_FILE) == []
+
+def test_golden_covers_every_function():
+    # A function added to the suite needs its golden outputs (--update-golden)
+    with open(GOLDEN_FILE) as f:
+        golden = json.load(f)
+    assert set(golden) == {f"{name}/{regime}" for name in benchmark.FUNCTIONS for regime in benchmark.REGIMES}
@@ -0,0 +1,62 @@
+"""
+Kernel backends: both give the same tags and Cycles, bad switches fall back.
+"""
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+import kernels
+from indicators import candleTagCodes, relativeCandlesPhases, cycleCodes
+from synthetic import randomOHLC
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def restore_backend():
+    backend, environ = kernels.backend, os.environ.get('KERNEL_BACKEND')
+    yield
+    kernels.backend = backend
+    if environ is None:
+        os.environ.pop('KERNEL_BACKEND', None)
+    else:
+        os.environ['KERNEL_BACKEND'] = environ
+
+def histories():
+    frames = [randomOHLC(bars, seed=bars) for bars in (0, 1, 2, 3, 5, 50)]
+    frames += [randomOHLC(3000, seed=seed, regime=regime, decimals=decimals)
+               for seed, (regime, decimals) in enumerate([('random', None), ('trending', None),
+                                                          ('ranging', 1), ('gappy', 2)])]
+    return frames
+
+def outputs(backend):
+    kernels.setBackend(backend)
+    return [(candleTagCodes(data), cycleCodes(data, relativeCandlesPhases(data))) for data in histories()]
+
+def test_numba_matches_python(restore_backend):
+    pytest.importorskip('numba')
+    for (tags, cycles), (ref_tags, ref_cycles) in zip(outputs('numba'), outputs('python')):
+        assert np.array_equal(tags, ref_tags)
+        assert np.array_equal(cycles, ref_cycles)
+
+def test_set_backend_rejects_unknown(restore_backend):
+    with pytest.raises(ValueError):
+        kernels.setBackend('cpu')
+
+def import_kernels(value):
+    env = {**os.environ, 'KERNEL_BACKEND': value}
+    code = "import os, kernels; print(kernels.backend, os.environ['KERNEL_BACKEND'])"
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+@pytest.mark.parametrize('value', ['NUMBA', 'cpu', ''])
+def test_unknown_environment_backend_falls_back(value):
+    result = import_kernels(value)
+    # Falls back without rewriting the environment
+    assert result.stdout.split(' ', 1) == ['python', f"{value}\n"]
+    assert 'Unknown KERNEL_BACKEND' in result.stderr
+
+def test_import_leaves_environment_alone():
+    env = {key: value for key, value in os.environ.items() if key != 'KERNEL_BACKEND'}
+    code = "import os, kernels; print('KERNEL_BACKEND' in os.environ)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,96 @@
+"""
+LiveScanner fed a replay of synthetic kline closes, against Plan.evaluate on
+the full history at every close.
+"""
+import time
+import pytest
+from binance import BinanceClient, INTERVAL_MS
+from criteria import Plan, Criterion
+from klines import records_to_frame
+from live import LiveScanner
+from store import CandleStore
+from synthetic import randomOHLC
+from standin import Exchange, candleRecords, klineMessage, serve
+
+INTERVAL = '1h'
+MS = INTERVAL_MS[INTERVAL]
+START = 1_700_000_000_000 // MS * MS
+BARS = 400
+SEEDED = 200  # Candles closed when the scanner is seeded
+SYMBOLS = ['AAAUSDT', 'BBBUSDT', 'CCCUSDT']
+# A streamed indicator, one on the last candles and tickers moving between criteria
+PLAN = Plan([
+    Criterion('buy sequence', [('reversal_pattern', '==', 1)]),
+    Criterion('up cycle', [('phase', '==', 1), ('cycle', 'in', ('A', 'CC', 'C'))]),
+    Criterion('down phase', [('phase', '==', -1)]),
+])
+
+@pytest.fixture
+def exchange(monkeypatch, tmp_path):
+    klines = {(symbol, INTERVAL): candleRecords(randomOHLC(BARS, seed=i, decimals=2), START, INTERVAL)
+              for i, symbol in enumerate(SYMBOLS)}
+    # Candle SEEDED opened 5 seconds ago
+    exchange = Exchange(klines, START + SEEDED * MS + 5000)
+    httpd = serve(exchange)
+    monkeypatch.setattr(time, 'time', lambda: exchange.now / 1000)
+    exchange.store = CandleStore(BinanceClient(base_url=httpd.base_url), root=str(tmp_path / 'candles'))
+    yield exchange
+    httpd.shutdown()
+    httpd.server_close()
+
+def replay(scanner, exchange, closes):
+    """ Stream the candles `closes` of every symbol: an update while open, then the close. """
+    for i in closes:
+        for symbol in SYMBOLS:
+            record = exchange.klines[(symbol, INTERVAL)][i]
+            exchange.now = int(record['time']) + 1000
+            assert not scanner.handle(klineMessage(symbol, INTERVAL, record, closed=False))
+            exchange.now = int(record['close_time']) + 1
+            scanner.handle(klineMessage(symbol, INTERVAL, record))
+
+def expected_events(exchange, symbol, closes):
+    """ Events and final criterion of `symbol` from Plan.evaluate on the history up to each close. """
+    records = exchange.klines[(symbol, INTERVAL)]
+    frame = records_to_frame(records)
+    current = PLAN.evaluate(frame.iloc[:SEEDED])
+    events = []
+    for i in closes:
+        criterion = PLAN.evaluate(frame.iloc[:i + 1])
+        if criterion != current:
+            events.append({'action': 'add' if criterion else 'remove', 'symbol': symbol, 'interval': INTERVAL,
+                           'criterion': criterion or current, 'time': int(records['close_time'][i])})
+            current = criterion
+    return events, current
+
+def run(exchange, closes):
+    events = []
+    scanner = LiveScanner(PLAN, exchange.store, events.append)
+    scanner.seed_all(SYMBOLS, [INTERVAL], workers=2)
+    # The kline still open when seeding is dropped, its close comes from the stream
+    for symbol in SYMBOLS:
+        assert scanner.symbols[(symbol, INTERVAL)].last_time == START + (SEEDED - 1) * MS
+    replay(scanner, exchange, closes)
+    return scanner, events
+
+def check(scanner, events, exchange, observed):
+    listed = []
+    for symbol in SYMBOLS:
+        expected, criterion = expected_events(exchange, symbol, observed)
+        assert [event for event in events if event['symbol'] == symbol] == expected
+        if criterion:
+            listed.append(symbol)
+    assert sorted(scanner.watchlist(INTERVAL)) == listed
+    assert events, "the replay should move tickers in and out of the watchlist"
+
+def test_replay_matches_full_history(exchange):
+    closes = range(SEEDED, BARS)
+    scanner, events = run(exchange, closes)
+    check(scanner, events, exchange, closes)
+
+def test_gap_resyncs_from_the_store(exchange):
+    # Candles 250-259 are never streamed, the close of 260 reveals the gap
+    closes = [*range(SEEDED, 250), *range(260, BARS)]
+    scanner, events = run(exchange, closes)
+    check(scanner, events, exchange, closes)
+    stored = exchange.store.read(SYMBOLS[0], INTERVAL)
+    assert list(stored['time']) == list(exchange.klines[(SYMBOLS[0], INTERVAL)]['time'])
@@ -0,0 +1,55 @@
+"""
+RangeTable queries against slices of the series, built at once or appended.
+"""
+import numpy as np
+import pytest
+from ranges import RangeTable, OHLCRanges
+from synthetic import randomOHLC
+
+def all_ranges(n):
+    """ Starts and ends of every non-empty range of n values. """
+    return np.triu_indices(n + 1, 1)
+
+@pytest.mark.parametrize('func, reduce', [(np.fmax, np.nanmax), (np.fmin, np.nanmin),
+                                          (np.maximum, np.max), (np.minimum, np.min)])
+@pytest.mark.filterwarnings('ignore:All-NaN slice')
+def test_query_matches_slices(func, reduce):
+    values = np.random.default_rng(0).normal(size=70).round(1)
+    values[[5, 40, 41]] = np.nan
+    table = RangeTable(values, func)
+    a, b = all_ranges(len(values))
+    np.testing.assert_array_equal(table.query(a, b), [reduce(values[i:j]) for i, j in zip(a, b)])
+    np.testing.assert_array_equal(table.query(3, 9), reduce(values[3:9]))
+
+def test_append_matches_built():
+    values = np.random.default_rng(1).normal(size=100)
+    built = RangeTable(values)
+    appended = RangeTable()
+    for start, end in [(0, 1), (1, 2), (2, 5), (5, 5), (5, 37), (37, 38), (38, 100)]:
+        appended.append(values[start:end])
+        assert len(appended) == end
+        a, b = all_ranges(end)
+        np.testing.assert_array_equal(appended.query(a, b), built.query(a, b))
+
+def test_empty_ranges_are_nan():
+    table = RangeTable([1, 2, 3])
+    assert np.isnan(table.query(2, 2))
+    assert np.isnan(table.query(2, 1))
+    assert np.isnan(RangeTable().query(0, 0))
+    np.testing.assert_array_equal(table.query([0, 1, 3], [2, 1, 3]), [2, np.nan, np.nan])
+
+def test_out_of_bounds_raises():
+    table = RangeTable([1, 2, 3])
+    with pytest.raises(IndexError):
+        table.query(0, 4)
+    with pytest.raises(IndexError):
+        table.query(-1, 2)
+
+def test_ohlc_ranges_append():
+    data = randomOHLC(50)
+    ranges = OHLCRanges()
+    ranges.append(data['Low'][:20], data['High'][:20])
+    ranges.append(data['Low'][20:], data['High'][20:])
+    assert len(ranges) == 50
+    assert ranges.low(10, 30) == data['Low'].iloc[10:30].min()
+    assert ranges.high(10, 30) == data['High'].iloc[10:30].max()
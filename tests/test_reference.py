@@ -0,0 +1,171 @@
+"""
+Table-driven indicators against plain-loop references of their rules.
+
+The references follow the original per-candle implementations: an if/else
+chain per tag, the phase and reversal sequences spelled out, and the Cycles
+FSM taking its extrema from slices. Data has many equal Highs/Lows and NaNs.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import kernels
+from indicators import (
+    CANDLE_TAGS, CYCLE_STATES, candleTagCodes, relativeCandlesPhases, relativeCandlesReversalSignals,
+    relativeCandlesReversalPatterns, cycleCodes, phaseChanges,
+)
+from synthetic import randomOHLC
+
+def tieHeavy(seed):
+    """ Small moves rounded to 0.1, so equal Highs/Lows and dojis are common. """
+    return randomOHLC(400, seed=seed, volatility=0.002, decimals=1)
+
+def withNaNs(seed):
+    data = randomOHLC(400, seed=seed, regime='gappy', decimals=2)
+    rng = np.random.default_rng(seed)
+    for column in ('Open', 'High', 'Low', 'Close'):
+        data.loc[data.index[rng.choice(len(data), 12, replace=False)], column] = np.nan
+    return data
+
+DATASETS = {f'ties{seed}': tieHeavy(seed) for seed in range(3)}
+DATASETS.update({f'nans{seed}': withNaNs(seed) for seed in range(3)})
+
+@pytest.fixture(params=kernels.BACKENDS)
+def backend(request):
+    if request.param == 'numba' and kernels.numba is None:
+        pytest.skip("numba is not installed")
+    previous = kernels.backend
+    kernels.setBackend(request.param)
+    yield request.param
+    kernels.backend = previous
+
+def referenceTags(data):
+    o, h, l, c = (data[column].tolist() for column in ('Open', 'High', 'Low', 'Close'))
+    tags = ['X'] * len(h)
+    for i in range(2, len(h)):
+        previous = tags[i-1]
+        hh, lh = h[i] > h[i-1], h[i-1] > h[i]
+        hl, ll = l[i] > l[i-1], l[i-1] > l[i]
+        green, red = c[i] > o[i], c[i] < o[i]
+        previous_inside = h[i-2] > h[i-1] and l[i-1] > l[i-2]
+        if hh and hl:
+            tags[i] = 'RU' if previous in ('D', 'RD', 'RD2', 'I', 'I2') else 'U'
+        elif lh and ll:
+            tags[i] = 'RD' if previous in ('U', 'RU', 'RU2', 'I', 'I2') else 'D'
+        elif lh and hl:
+            if previous in ('I', 'I2'):
+                tags[i] = 'I2'
+            elif previous in ('RD', 'RD2'):
+                tags[i] = 'I'
+            else:
+                tags[i] = 'I2' if previous_inside else 'I'
+        elif hh and ll:
+            if previous in ('U', 'D'):
+                tags[i] = 'RU'
+            elif green:
+                tags[i] = 'RU2'
+            elif red:
+                tags[i] = 'RD2'
+    return tags
+
+def referencePhases(data):
+    tags = referenceTags(data)
+    first = data['Close'].iloc[0] > data['Open'].iloc[0]
+    phases = [1 if first else -1] * len(tags)
+    for i in range(3, len(tags)):
+        state2, state1, state0 = tags[i-2], tags[i-1], tags[i]
+        after_down = state1 in ('D', 'RD', 'RD2') or (state2 in ('D', 'RD', 'RD2') and state1 == 'I')
+        after_up = state1 in ('U', 'RU', 'RU2') or (state2 in ('U', 'RU', 'RU2') and state1 == 'I')
+        after_inside = state2 == 'I' and state1 == 'I2'
+        if (after_down or after_inside) and state0 in ('RU', 'RU2'):
+            phases[i] = 1
+        elif (after_up or after_inside) and state0 in ('RD', 'RD2'):
+            phases[i] = -1
+        else:
+            phases[i] = phases[i-1]
+    return phases
+
+def referencePattern(data):
+    state2, state1, state0 = referenceTags(data.iloc[-5:])[-3:]
+    after_down = state1 in ('D', 'RD') or (state2 in ('D', 'RD') and state1 == 'I')
+    after_up = state1 in ('U', 'RU') or (state2 in ('U', 'RU') and state1 == 'I')
+    if after_down and state0 == 'RU':
+        return 1
+    if after_down and state0 == 'RD2':
+        return 2
+    if after_up and state0 == 'RD':
+        return -1
+    if after_up and state0 == 'RU2':
+        return -2
+    return 0
+
+def referenceCycles(data):
+    phases = referencePhases(data)
+    lows, highs = data['Low'].reset_index(drop=True), data['High'].reset_index(drop=True)
+    low = lambda a, b: lows.iloc[a:b].min()
+    high = lambda a, b: highs.iloc[a:b].max()
+    state, cycles = 'X', []
+    for i, phase in enumerate(phases):
+        up = phase == 1
+        if state == 'A':
+            state = 'A' if up else 'B'
+        elif state == 'B':
+            first, last = phaseChanges(phases[:i], nphases=2)[:2]
+            state = ('CC' if up else 'B') if low(first, last) < low(last, i + 1) else '-A'
+        elif state == 'CC':
+            changes = phaseChanges(phases[:i], nphases=3)
+            if high(changes[-1], i + 1) > high(changes[0], changes[-1]):
+                state = 'C'
+            else:
+                state = 'CC' if up else '-CC'
+        elif state == 'C':
+            state = 'C' if up else 'D'
+        elif state == 'D':
+            changes = phaseChanges(phases[:i], nphases=3)
+            state = ('CC' if up else 'D') if low(changes[0], changes[-1]) < low(changes[-1], i + 1) else '-A'
+        elif state == '-A':
+            state = '-B' if up else '-A'
+        elif state == '-B':
+            first, last = phaseChanges(phases[:i], nphases=2)[:2]
+            state = ('-B' if up else 'A') if high(first, last) < high(last, i + 1) else '-CC'
+        elif state == '-CC':
+            changes = phaseChanges(phases[:i], nphases=3)
+            if low(changes[-1], i + 1) < low(changes[0], changes[-1]):
+                state = '-C'
+            else:
+                state = 'CC' if up else '-CC'
+        elif state == '-C':
+            state = '-D' if up else '-C'
+        elif state == '-D':
+            changes = phaseChanges(phases[:i], nphases=3)
+            state = ('-D' if up else '-CC') if high(changes[0], changes[-1]) > high(changes[-1], i + 1) else 'A'
+        else:
+            state = 'A' if up else '-A'
+        cycles.append(state)
+    return cycles
+
+@pytest.mark.parametrize('name', DATASETS)
+def test_tags(name, backend):
+    data = DATASETS[name]
+    assert [CANDLE_TAGS[code] for code in candleTagCodes(data)] == referenceTags(data)
+
+@pytest.mark.parametrize('name', DATASETS)
+def test_phases(name, backend):
+    data = DATASETS[name]
+    assert relativeCandlesPhases(data).tolist() == referencePhases(data)
+
+@pytest.mark.parametrize('name', DATASETS)
+def test_reversal_patterns(name):
+    data = DATASETS[name]
+    expected = [0, 0] + [referencePattern(data.iloc[:i+1]) for i in range(2, len(data))]
+    assert relativeCandlesReversalSignals(data).tolist() == expected
+    assert relativeCandlesReversalPatterns(data) == expected[-1]
+
+@pytest.mark.parametrize('name', DATASETS)
+def test_cycles(name, backend):
+    data = DATASETS[name]
+    assert [CYCLE_STATES[code] for code in cycleCodes(data)] == referenceCycles(data)
+
+def test_data_exercises_ties_and_nans():
+    ties = DATASETS['ties0']
+    assert (ties['High'].diff() == 0).sum() > 20 and (ties['Low'].diff() == 0).sum() > 20
+    assert DATASETS['nans0'][['High', 'Low']].isna().any().all()
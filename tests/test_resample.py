@@ -0,0 +1,67 @@
+"""
+resample_klines against exchange klines.
+
+tests/data holds /klines rows (exchange wire format) of one symbol: 15m and 1h
+klines from 2024-03-01 05:00 to 2024-03-04 13:30 UTC, and the 4h / 1d klines
+opening in that range. The history starts off the 4h and 1d boundaries and
+ends inside the last 4h and 1d klines. These fixtures were built offline with
+the 4h / 1d rows aggregated independently of resample.py; record_klines.py
+replaces them with a recording from the exchange.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from binance import INTERVAL_MS
+from klines import klines_to_records, records_to_frame
+from resample import resample_klines
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def length(interval):
+    return pd.Timedelta(milliseconds=INTERVAL_MS[interval])
+
+def klines(interval):
+    with open(os.path.join(DATA, f'klines_{interval}.json')) as f:
+        return records_to_frame(klines_to_records(json.load(f)))
+
+def assert_klines_equal(resampled, exchange):
+    assert list(resampled.index) == list(exchange.index)
+    for column in ('Open', 'High', 'Low', 'Close'):
+        np.testing.assert_array_equal(resampled[column].to_numpy(), exchange[column].to_numpy(), err_msg=column)
+    # Volumes are sums of decimals, equal up to float rounding
+    np.testing.assert_allclose(resampled['Volume'].to_numpy(), exchange['Volume'].to_numpy(), rtol=1e-9)
+
+@pytest.mark.parametrize('base, interval', [('15m', '1h'), ('15m', '4h'), ('1h', '4h'), ('15m', '1d'), ('1h', '1d')])
+def test_closed_klines_match_exchange(base, interval):
+    data = klines(base)
+    exchange = klines(interval)
+    end = data.index[-1] + length(base)
+    closed = exchange[exchange.index + length(interval) <= end]
+    assert_klines_equal(resample_klines(data, interval, partial=False), closed)
+
+@pytest.mark.parametrize('base', ['15m', '1h'])
+def test_daily_klines_align_on_utc_midnight(base):
+    resampled = resample_klines(klines(base), '1d')
+    assert (resampled.index == resampled.index.normalize()).all()
+    # The history starts at 05:00, the day it starts in is incomplete and dropped
+    assert resampled.index[0] == pd.Timestamp('2024-03-02')
+    assert list(resampled.index) == list(klines('1d').index)
+
+@pytest.mark.parametrize('base, interval', [('15m', '4h'), ('15m', '1d'), ('1h', '1d')])
+def test_partial_last_kline(base, interval):
+    data = klines(base)
+    exchange = klines(interval)
+    resampled = resample_klines(data, interval)
+    last, reference = resampled.iloc[-1], exchange.iloc[-1]
+    # The last kline is still being built from the base history
+    assert resampled.index[-1] == exchange.index[-1] > data.index[-1] - length(interval)
+    assert last['Open'] == reference['Open']
+    assert last['High'] <= reference['High'] and last['Low'] >= reference['Low']
+    assert last['Volume'] <= reference['Volume'] * (1 + 1e-9)
+    since = data[data.index >= resampled.index[-1]]
+    assert last['Close'] == since['Close'].iloc[-1]
+    assert last['High'] == since['High'].max() and last['Low'] == since['Low'].min()
+    # Left out when only closed klines are wanted
+    assert resample_klines(data, interval, partial=False).index[-1] < resampled.index[-1]
@@ -0,0 +1,65 @@
+"""
+Scheduled scan ticks against the stand-in exchange.
+"""
+import time
+import pandas as pd
+import pytest
+import scan
+from binance import BinanceClient, INTERVAL_MS
+from history import SignalHistory
+from indicators import Cycles
+from klines import records_to_frame
+from store import CandleStore
+from synthetic import randomOHLC
+from standin import Exchange, candleRecords, serve
+
+INTERVAL = '1h'
+MS = INTERVAL_MS[INTERVAL]
+START = 1_700_000_000_000 // MS * MS
+BARS = 300
+TICK = 200  # Candle opening at the first scheduled tick
+SYMBOLS = [f"S{i}USDT" for i in range(30)]
+
+@pytest.fixture
+def exchange(monkeypatch, tmp_path):
+    klines = {(symbol, INTERVAL): candleRecords(randomOHLC(BARS, seed=i, decimals=2), START, INTERVAL)
+              for i, symbol in enumerate(SYMBOLS)}
+    exchange = Exchange(klines, START)
+    httpd = serve(exchange)
+    monkeypatch.setattr(time, 'time', lambda: exchange.now / 1000)
+    monkeypatch.chdir(tmp_path)
+    exchange.store = CandleStore(BinanceClient(base_url=httpd.base_url), root=str(tmp_path / 'candles'))
+    exchange.history = SignalHistory(str(tmp_path / 'history.sqlite'))
+    yield exchange
+    httpd.shutdown()
+    httpd.server_close()
+
+def listed(exchange, closed):
+    """ Symbols the plan lists on their first `closed` candles. """
+    return [symbol for symbol in SYMBOLS
+            if scan.plan.evaluate(records_to_frame(exchange.klines[(symbol, INTERVAL)][:closed]))]
+
+def test_scheduled_tick_evaluates_the_closed_kline(exchange):
+    state, expected = {}, []
+    for tick in (TICK, TICK + 1, TICK + 2):
+        # Woken just after the close, the exchange already has the next kline open
+        exchange.now = START + tick * MS + scan.SETTLE_SECONDS * 1000
+        scan.main(exchange.store, exchange.history, workers=2, timeframes=[INTERVAL], state=state)
+        closed = START + (tick - 1) * MS
+        assert set(state['stamps'].values()) == {pd.Timestamp(closed, unit='ms')}
+        expected = listed(exchange, tick)
+        assert sorted(symbol for symbol, _ in state['members']) == sorted(expected)
+        assert {row[2] for row in state['members'].values()} <= {closed + MS - 1}
+    assert expected
+
+def test_history_records_the_cycle_of_listed_tickers(exchange):
+    state = {}
+    exchange.now = START + TICK * MS + scan.SETTLE_SECONDS * 1000
+    scan.main(exchange.store, exchange.history, workers=2, timeframes=[INTERVAL], state=state)
+    rows = exchange.history.signals(timeframe=INTERVAL)
+    assert rows
+    for row in rows:
+        # The default criteria only compute reversal patterns, the cycle comes with the artifact
+        frame = records_to_frame(exchange.klines[(row['symbol'], INTERVAL)][:TICK])
+        assert row['cycle'] == Cycles(frame).iloc[-1]
+        assert state['members'][(row['symbol'], INTERVAL)][1] == row['cycle']
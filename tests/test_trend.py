@@ -0,0 +1,50 @@
+"""
+trendingCycleSignals on hand-built phases: 1 after two cycles up, -1 after two
+cycles down, 0 otherwise and on histories too short to hold two cycles.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import trendingCycleSignals, trendingCycles
+
+# Six phases of two candles each, then the first candle of a seventh
+UP_PHASES = [1, 1, -1, -1, 1, 1, -1, -1, 1, 1, -1, -1, 1, 1]
+
+def candles(highs, lows):
+    highs, lows = np.asarray(highs, dtype=float), np.asarray(lows, dtype=float)
+    middle = (highs + lows) / 2
+    return pd.DataFrame({'Open': middle, 'High': highs, 'Low': lows, 'Close': middle})
+
+def test_two_cycles_up():
+    # Every candle above the previous one
+    data = candles(np.arange(14) + 10, np.arange(14) + 5)
+    trend = trendingCycleSignals(data, phases=UP_PHASES)
+    # Only the phase 2 (going down) of the fifth phase onwards, back to 0 when the next phase 1 begins
+    assert trend.tolist() == [0] * 10 + [1, 1, 0, 0]
+
+def test_two_cycles_down():
+    data = candles(30 - np.arange(14), 25 - np.arange(14))
+    trend = trendingCycleSignals(data, phases=[-phase for phase in UP_PHASES])
+    assert trend.tolist() == [0] * 10 + [-1, -1, 0, 0]
+
+@pytest.mark.parametrize('highs, lows', [
+    # Higher Highs with Lower Lows
+    (np.arange(14) + 10, 5 - np.arange(14)),
+    # Higher Lows with Lower Highs
+    (30 - np.arange(14), np.arange(14)),
+    # Flat
+    (np.full(14, 10), np.full(14, 5)),
+])
+def test_no_trend(highs, lows):
+    data = candles(highs, lows)
+    assert not trendingCycleSignals(data, phases=UP_PHASES).any()
+    assert not trendingCycleSignals(data, phases=[-phase for phase in UP_PHASES]).any()
+
+@pytest.mark.parametrize('n', [0, 1, 3, 8])
+def test_short_history(n):
+    # Fewer than 4 phase changes: no candle has two full cycles behind it
+    data = candles(np.arange(n) + 10, np.arange(n) + 5)
+    trend = trendingCycleSignals(data, phases=UP_PHASES[:n])
+    assert trend.tolist() == [0] * n
+    if n:
+        assert trendingCycles(data) == 0
@@ -0,0 +1,86 @@
+"""
+Batch chart rendering: unchanged charts are skipped, the index page follows
+the watchlist, and every chart reuses one figure per process.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip('mplfinance')
+
+import view
+from artifacts import write_artifact
+from synthetic import randomOHLC
+
+class Renders(list):
+    """ Tickers rendered so far, those in `fail` raise instead. """
+    def __init__(self):
+        super().__init__()
+        self.fail = set()
+
+    def render_chart(self, ticker, data, path):
+        if ticker in self.fail:
+            raise RuntimeError(f"cannot draw {ticker}")
+        self.append(ticker)
+        with open(path, 'w') as f:
+            f.write(ticker)
+        return path
+
+@pytest.fixture
+def rendered(monkeypatch):
+    renders = Renders()
+    monkeypatch.setattr(view, 'render_chart', renders.render_chart)
+    # Workers as threads, so they see the patched render_chart
+    monkeypatch.setattr(view, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    return renders
+
+def write_watchlist(path, frames):
+    """ Watchlist file and scan artifact of {ticker: candles}. """
+    with open(path, 'w') as f:
+        f.write(''.join(f"{ticker}\n" for ticker in frames))
+    write_artifact(path, '1h', frames)
+
+def render(watchlist, output):
+    index = view.render_watchlist(watchlist, None, '1h', output, processes=1)
+    with open(index) as f:
+        return f.read()
+
+def test_unchanged_charts_are_skipped(tmp_path, rendered):
+    watchlist, output = str(tmp_path / 'watchlist_1h_20240101_0000.txt'), str(tmp_path / 'charts')
+    write_watchlist(watchlist, {'AUSDT': randomOHLC(150, seed=1), 'BUSDT': randomOHLC(150, seed=2)})
+    page = render(watchlist, output)
+    assert rendered == ['AUSDT', 'BUSDT']
+    assert page.index('AUSDT.png') < page.index('BUSDT.png')
+    with open(os.path.join(output, view.MANIFEST_FILE)) as f:
+        assert set(json.load(f)) == {'AUSDT.png', 'BUSDT.png'}
+
+    rendered.clear()
+    assert render(watchlist, output) == page
+    assert rendered == []
+
+    # BUSDT has a new candle, AUSDT left the watchlist and CUSDT joined
+    write_watchlist(watchlist, {'BUSDT': randomOHLC(151, seed=2), 'CUSDT': randomOHLC(150, seed=3)})
+    page = render(watchlist, output)
+    assert sorted(rendered) == ['BUSDT', 'CUSDT']
+    assert 'AUSDT' not in page and page.index('BUSDT.png') < page.index('CUSDT.png')
+
+def test_failed_charts_are_rendered_again(tmp_path, rendered):
+    watchlist, output = str(tmp_path / 'watchlist_1h_20240101_0000.txt'), str(tmp_path / 'charts')
+    write_watchlist(watchlist, {'AUSDT': randomOHLC(150, seed=1)})
+    rendered.fail.add('AUSDT')
+    render(watchlist, output)
+    assert rendered == []
+    rendered.fail.clear()
+    render(watchlist, output)
+    assert rendered == ['AUSDT']
+
+def test_render_chart_reuses_the_figure(tmp_path):
+    data = randomOHLC(120, seed=4)
+    first = view.render_chart('AUSDT', data, str(tmp_path / 'AUSDT.png'))
+    figure = view.chart_figure()
+    second = view.render_chart('BUSDT', data.iloc[:80], str(tmp_path / 'BUSDT.svg'))
+    assert view.chart_figure() is figure
+    assert os.path.getsize(first) > 0 and os.path.getsize(second) > 0
+    # Axes are cleared between charts: only the last squeeze line is left
+    assert len(figure[3].lines) == 1
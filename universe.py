@@ -0,0 +1,62 @@
+"""
+Ticker universe of a scan.
+
+exchangeInfo is a heavy response that rarely changes, so it is cached on disk
+(next to the candle store) and only fetched again once older than a TTL.
+Symbols are then prefiltered with a single bulk 24h ticker request: only
+USDT symbols that are trading, with enough quote volume and trades over the
+last 24h, are scanned, so every symbol filtered out saves its kline requests.
+"""
+import json
+import logging
+import os
+import time
+from metrics import metrics
+from store import STORE_DIR
+
+EXCHANGE_INFO_FILE = os.path.join(STORE_DIR, 'exchange_info.json')
+EXCHANGE_INFO_TTL = 24 * 3600  # Seconds before the cached exchangeInfo is fetched again
+EXCHANGE_INFO_WEIGHT = 20
+TICKER_24H_WEIGHT = 40  # /ticker/24hr for every symbol
+QUOTE_ASSET = 'USDT'
+MIN_QUOTE_VOLUME = 1_000_000  # Quote asset traded over the last 24h
+MIN_TRADES = 1000  # Trades over the last 24h
+
+def exchange_info(client, path=EXCHANGE_INFO_FILE, ttl=EXCHANGE_INFO_TTL):
+    """ exchangeInfo from the cache at `path`, fetched (and cached) when missing or older than `ttl` seconds. """
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+        with open(path) as f:
+            metrics.count('exchange_info_cached')
+            return json.load(f)
+    with metrics.timer('exchange_info'):
+        info = client.get("/api/v1/exchangeInfo", weight=EXCHANGE_INFO_WEIGHT).json()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Written aside then renamed so a reader never sees half a file
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(info, f)
+    os.replace(f"{path}.tmp", path)
+    return info
+
+def ticker_stats(client):
+    """ {symbol: 24h ticker} of every symbol, in one request. """
+    with metrics.timer('ticker_24h'):
+        tickers = client.get("/api/v1/ticker/24hr", weight=TICKER_24H_WEIGHT).json()
+    return {ticker['symbol']: ticker for ticker in tickers}
+
+def universe(client, path=EXCHANGE_INFO_FILE, ttl=EXCHANGE_INFO_TTL, quote_asset=QUOTE_ASSET,
+             min_quote_volume=MIN_QUOTE_VOLUME, min_trades=MIN_TRADES):
+    """ Trading `quote_asset` symbols, in exchange order, that pass the 24h volume and trade count filters. """
+    info = exchange_info(client, path, ttl)
+    symbols = [item['symbol'] for item in info['symbols']
+               if item['quoteAsset'] == quote_asset and item.get('status', 'TRADING') == 'TRADING']
+    if not min_quote_volume and not min_trades:
+        return symbols
+    stats = ticker_stats(client)
+    # Symbols without a 24h ticker have not traded
+    listed = [symbol for symbol in symbols if symbol in stats
+              and float(stats[symbol].get('quoteVolume', 0)) >= min_quote_volume
+              and int(stats[symbol].get('count', 0)) >= min_trades]
+    metrics.count('symbols_filtered', len(symbols) - len(listed))
+    logging.info(f"{len(listed)} of {len(symbols)} trading {quote_asset} symbols pass the 24h filters "
+                 f"(quote volume >= {min_quote_volume:,.0f}, trades >= {min_trades:,}).")
+    return listed
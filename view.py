@@ -1,7 +1,16 @@
+import argparse
+import hashlib
+import html
+import json
 import logging
 import os
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import requests
+from binance import BinanceClient, fetch_concurrently, DEFAULT_WORKERS
+from store import CandleStore
+from artifacts import read_artifact, artifact_frame
+from history import SignalHistory, HISTORY_FILE
 import mplfinance as mpf  # For candlestick plotting
 from indicators import squeeze  # Assuming this function exists in indicators.py
 import matplotlib.pyplot as plt
@@ -15,34 +24,30 @@ logging.basicConfig(
 
 logging.info("Script started")
 
-# Fetch historical data for each ticker based on timeframe
-def fetch_data(ticker, interval):
-    url = f"https://api.binance.com/api/v1/klines?symbol={ticker}&interval={interval}"
+# Fetch historical data for each ticker based on timeframe, from the local
+# candle store shared with scan.py
+def fetch_data(store, ticker, interval):
     logging.info(f"Fetching {interval} data for {ticker}...")
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        # Select only the first 6 columns (Time, Open, High, Low, Close, Volume)
-        df = pd.DataFrame(data, columns=[
-            'Time', 'Open', 'High', 'Low', 'Close', 'Volume', '_', '_', '_', '_', '_', '_'
-        ])
-        df = df[['Time', 'Open', 'High', 'Low', 'Close', 'Volume']]
-        df['Time'] = pd.to_datetime(df['Time'], unit='ms')
-        df.set_index('Time', inplace=True)
-        df = df.astype(float)  # Ensure all columns are float
-        df = df.tail(100)
+        # Nothing is downloaded while the stored last candle is still the current one
+        store.update(ticker, interval, refresh=False)
+        df = store.load(ticker, interval, limit=100)
         logging.info(f"Fetched {interval} data for {ticker}.")
         return df
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching {interval} data for {ticker}: {e}")
         return None
+    except Exception as e:
+        # Bad response or store file: skip this chart, not the whole batch
+        logging.error(f"Error loading {interval} data for {ticker}: {e!r}")
+        return None
 
 # Plot OHLCV candles and squeeze indicator for each ticker
 def plot_price_and_squeeze(ticker, data):
     logging.info(f"Plotting OHLCV candles and squeeze indicator for {ticker}...")
 
-    squeeze_values = squeeze(data)
+    # Scan artifacts already hold the squeeze values
+    squeeze_values = data['Squeeze'] if 'Squeeze' in data else squeeze(data)
 
     # Plotting using mplfinance for candlestick chart
     fig, axes = mpf.plot(
@@ -69,8 +74,138 @@ def plot_price_and_squeeze(ticker, data):
     plt.pause(5)  # Show for 10 seconds
     plt.close()  # Close the plot after 10 seconds
 
+# Candles of every watchlist ticker: from the scan artifact when it covers
+# the interval (no network, no recomputation), else from the store
+def watchlist_frames(watchlist_file, tickers, interval, store, workers=DEFAULT_WORKERS):
+    artifact = read_artifact(watchlist_file)
+    if artifact and artifact[1]['interval'] == interval:
+        array, index = artifact
+        logging.info(f"Using scan artifact of {watchlist_file}.")
+        for ticker in tickers:
+            yield ticker, artifact_frame(array, index, ticker) if ticker in index['tickers'] else None
+        return
+    fetch = lambda ticker, interval: fetch_data(store, ticker, interval)
+    for (ticker, _), data in fetch_concurrently(fetch, [(ticker, interval) for ticker in tickers],
+                                                max_workers=workers):
+        yield ticker, data
+
+# Batch rendering: every chart of a watchlist saved to files by worker
+# processes on the non-interactive Agg backend
+CHARTS_DIR = 'charts'
+MANIFEST_FILE = 'manifest.json'  # Chart file -> digest of the candles it shows
+CHART_STYLE = None  # mplfinance style, built once per process
+CHART_FIGURE = None  # (figure, price axes, volume axes, squeeze axes), reused for every chart
+
+def chart_figure():
+    """ The figure and axes of this process, created on first use. """
+    global CHART_STYLE, CHART_FIGURE
+    if CHART_FIGURE is None:
+        plt.switch_backend('Agg')
+        CHART_STYLE = mpf.make_mpf_style(base_mpf_style='yahoo')
+        fig = mpf.figure(style=CHART_STYLE, figsize=(12, 9))
+        ax_price = fig.add_axes([0.1, 0.42, 0.85, 0.5])
+        ax_volume = fig.add_axes([0.1, 0.3, 0.85, 0.1], sharex=ax_price)
+        ax_squeeze = fig.add_axes([0.1, 0.06, 0.85, 0.18], sharex=ax_price)
+        CHART_FIGURE = (fig, ax_price, ax_volume, ax_squeeze)
+    return CHART_FIGURE
+
+def render_chart(ticker, data, path):
+    """ Save the candlestick and squeeze chart of `data` to `path` (format from its extension). """
+    fig, ax_price, ax_volume, ax_squeeze = chart_figure()
+    for ax in (ax_price, ax_volume, ax_squeeze):
+        ax.clear()
+    mpf.plot(data, type='candle', ax=ax_price, volume=ax_volume, mav=(20, 50))
+    ax_price.set_title(f"{ticker} - OHLCV Candlestick Chart")
+    ax_price.set_ylabel("Price")
+    ax_volume.set_ylabel("Volume")
+    # mplfinance puts candle i at x = i
+    squeeze_values = data['Squeeze'] if 'Squeeze' in data else squeeze(data)
+    ax_squeeze.plot(np.arange(len(data)), squeeze_values, label='Squeeze Indicator', color='r')
+    ax_squeeze.set_ylabel('Squeeze')
+    ax_squeeze.grid(True)
+    ax_squeeze.legend()
+    fig.savefig(path)
+    return path
+
+def render_charts(jobs):
+    """ Worker entry point: render (ticker, data, path) jobs, returns the paths written. """
+    return [render_chart(*job) for job in jobs]
+
+def candles_digest(data):
+    """ Digest of the candles a chart shows, to skip redrawing unchanged charts. """
+    candles = data[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=float)
+    return hashlib.sha1(data.index.asi8.tobytes() + candles.tobytes()).hexdigest()
+
+def write_index(output_dir, title, charts):
+    """ index.html linking every (ticker, chart file) in order. """
+    items = "\n".join(f'<figure><a href="{html.escape(name)}"><img src="{html.escape(name)}" loading="lazy"></a>'
+                      f'<figcaption>{html.escape(ticker)}</figcaption></figure>' for ticker, name in charts)
+    with open(os.path.join(output_dir, 'index.html'), 'w') as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>body{{font-family:sans-serif}} figure{{display:inline-block;margin:8px}} img{{width:480px}}</style>
+</head><body><h1>{html.escape(title)}</h1>
+{items}
+</body></html>
+""")
+
+def render_watchlist(watchlist_file, store, interval='1d', output_dir=None, fmt='png', processes=None,
+                     workers=DEFAULT_WORKERS, batch_size=4):
+    """
+    Render the chart of every watchlist ticker to files plus an index page.
+
+    Candles come from the scan artifact, else from the CandleStore `store`.
+
+    Charts whose candles have not changed since they were last rendered are
+    kept. Returns the index page path.
+    """
+    with open(watchlist_file) as f:
+        tickers = [line.strip() for line in f if line.strip()]
+    name = os.path.splitext(os.path.basename(watchlist_file))[0]
+    output_dir = output_dir or os.path.join(CHARTS_DIR, f"{name}_{interval}")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    charts, jobs, digests = {}, [], {}
+    for ticker, data in watchlist_frames(watchlist_file, tickers, interval, store, workers):
+        if data is None or data.empty:
+            logging.warning(f"No valid data for {ticker}.")
+            continue
+        filename = f"{ticker}.{fmt}"
+        charts[ticker] = filename
+        digests[filename] = candles_digest(data)
+        if manifest.get(filename) == digests[filename] and os.path.exists(os.path.join(output_dir, filename)):
+            logging.debug(f"Chart of {ticker} unchanged, skipping.")
+            continue
+        jobs.append((ticker, data, os.path.join(output_dir, filename)))
+
+    logging.info(f"Rendering {len(jobs)} charts ({len(charts) - len(jobs)} unchanged) to {output_dir}...")
+    if jobs:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            batches = [jobs[i:i+batch_size] for i in range(0, len(jobs), batch_size)]
+            for batch, future in zip(batches, [executor.submit(render_charts, batch) for batch in batches]):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error rendering {[job[0] for job in batch]}: {e}")
+                    for job in batch:
+                        digests.pop(os.path.basename(job[2]), None)
+
+    manifest.update(digests)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    write_index(output_dir, f"{name} ({interval})",
+                [(ticker, charts[ticker]) for ticker in tickers if ticker in charts])
+    index = os.path.join(output_dir, 'index.html')
+    logging.info(f"Charts index written to {index}")
+    return index
+
 # Read the watchlist file and fetch historical data for each ticker
-def read_watchlist_and_plot(watchlist_file, interval='1d'):
+def read_watchlist_and_plot(watchlist_file, store, interval='1d'):
     if not os.path.exists(watchlist_file):
         logging.error(f"Watchlist file {watchlist_file} not found.")
         return
@@ -78,9 +213,8 @@ def read_watchlist_and_plot(watchlist_file, interval='1d'):
     with open(watchlist_file, 'r') as f:
         tickers = [line.strip() for line in f.readlines()]
 
-    for ticker in tickers:
+    for ticker, data in watchlist_frames(watchlist_file, tickers, interval, store, workers=1):
         logging.info(f"Processing {ticker}...")
-        data = fetch_data(ticker, interval)
         if data is not None and not data.empty:
             plot_price_and_squeeze(ticker, data)
         else:
@@ -90,13 +224,33 @@ import glob  # For file pattern matching
 
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot the charts of a watchlist.")
+    parser.add_argument('watchlist', nargs='?', default=None,
+                        help="Watchlist name or file (default: asked, blank for the last created)")
+    parser.add_argument('--interval', default=None, help="Chart timeframe (default: asked, '1d' if blank)")
+    parser.add_argument('--batch', action='store_true', help="Render every chart to files instead of showing them")
+    parser.add_argument('--output', default=None, help=f"Batch output directory (default: under {CHARTS_DIR}/)")
+    parser.add_argument('--format', default='png', choices=['png', 'svg'], help="Batch chart file format")
+    parser.add_argument('--processes', type=int, default=None, help="Batch rendering processes")
+    args = parser.parse_args()
+
     # Specify the watchlist file
-    file = input("Enter the watchlist file name (leave blank for last created): ")
+    file = args.watchlist if args.watchlist is not None else \
+        input("Enter the watchlist file name (leave blank for last created): ")
 
     # Default timeframe if no file is specified
     if file.strip() == "":
-        # Get all watchlist files that match the naming structure
-        files = glob.glob('watchlists/watchlist_*.txt')
+        # The signal history knows the latest watchlist, older scans only left files
+        run = None
+        if os.path.exists(HISTORY_FILE):
+            signal_history = SignalHistory(HISTORY_FILE)
+            run = signal_history.latest_run()
+            signal_history.close()
+        if run and run['file'] and os.path.exists(run['file']):
+            files = [run['file']]
+        else:
+            # Get all watchlist files that match the naming structure
+            files = glob.glob('watchlists/watchlist_*.txt')
 
         if files:  # If there are any matching files
             # Sort files by modification time and select the latest
@@ -106,15 +260,25 @@ if __name__ == "__main__":
         else:
             print("No watchlist files found in the directory.")
             watchlist_file = None  # Set to None or handle accordingly
+    elif os.path.exists(file):
+        watchlist_file = file
     else:
         watchlist_file = f'watchlists/{file}.txt'
     
     # If a valid watchlist file was found, proceed
     if watchlist_file:
-        interval = input("Enter the timeframe (e.g., '1d', '1h', '15m', default '1d'): ")
+        interval = args.interval if args.interval is not None else \
+            input("Enter the timeframe (e.g., '1d', '1h', '15m', default '1d'): ")
         if not interval.strip():  # If still empty, set a default timeframe
             interval = '1d'
-        read_watchlist_and_plot(watchlist_file, interval)
+        # Candles come from the local store shared with scan.py
+        store = CandleStore(BinanceClient())
+        if not args.batch:
+            read_watchlist_and_plot(watchlist_file, store, interval)
+        elif os.path.exists(watchlist_file):
+            render_watchlist(watchlist_file, store, interval, args.output, args.format, args.processes)
+        else:
+            logging.error(f"Watchlist file {watchlist_file} not found.")
     else:
         logging.error("No valid watchlist file available.")
 